@@ -0,0 +1,102 @@
+import hashlib
+import time
+
+from api.metrics import CACHE_REQUESTS, metrics_store
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from foodgram import constants
+
+GLOBAL_SCOPE = 'global'
+LIST_SCOPE = 'list'
+
+
+def recipe_scope(recipe_id):
+    """Возвращает область инвалидации одного рецепта."""
+    return f'recipe:{recipe_id}'
+
+
+class ResponseCache:
+    """Кэш ответов для анонимных пользователей с поколениями.
+
+    Ключ ответа включает текущие номера поколений его областей
+    инвалидации, поэтому сброс области сводится к увеличению ее номера:
+    старые записи становятся недостижимыми и вытесняются по таймауту.
+    """
+
+    def __init__(self, prefix, timeout, alias='default'):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.alias = alias
+
+    @property
+    def cache(self):
+        """Возвращает используемый бэкенд кэша."""
+        return caches[self.alias]
+
+    def _generation_key(self, scope):
+        return f'{self.prefix}:gen:{scope}'
+
+    def get_generations(self, scopes):
+        """Возвращает номера поколений областей, создавая недостающие."""
+        keys = [self._generation_key(scope) for scope in scopes]
+        generations = self.cache.get_many(keys)
+        for key in keys:
+            if key not in generations:
+                # Начальное значение от времени не дает вернуться к
+                # поколению, записи которого еще лежат в кэше.
+                self.cache.add(key, time.time_ns(), timeout=None)
+                generations[key] = self.cache.get(key)
+        return [generations[key] for key in keys]
+
+    def bump(self, *scopes):
+        """Сбрасывает закэшированные ответы указанных областей."""
+        for scope in scopes:
+            key = self._generation_key(scope)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, time.time_ns(), timeout=None)
+
+    def make_key(self, request, kind, scopes):
+        """Строит ключ ответа по нормализованным параметрам запроса."""
+        params = sorted(
+            (name, sorted(set(request.query_params.getlist(name))))
+            for name in request.query_params
+        )
+        raw = repr((
+            request.get_host(),
+            kind,
+            params,
+            self.get_generations(scopes),
+        ))
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f'{self.prefix}:{kind}:{digest}'
+
+    def _count(self, result):
+        """Учитывает обращение к кэшу в метриках процесса."""
+        metrics_store.increment(CACHE_REQUESTS, self.prefix, result)
+
+    def get_response(self, request, kind, scopes, build_response):
+        """Возвращает ответ из кэша или строит и сохраняет его."""
+        if request.user.is_authenticated:
+            return build_response()
+        key = self.make_key(request, kind, scopes)
+        data = self.cache.get(key)
+        if data is not None:
+            self._count('hit')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        self._count('miss')
+        response = build_response()
+        if response.status_code == 200:
+            self.cache.set(key, response.data, timeout=self.timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+recipe_response_cache = ResponseCache(
+    prefix='recipes',
+    timeout=constants.RESPONSE_CACHE_TIMEOUT,
+)
@@ -0,0 +1,126 @@
+from api.indexes import VersionedSnapshot, get_model_version
+from django.db import transaction
+from django.db.models import Count, Max
+from recipes.models import Recipe, Tag
+from recipes.transactions import on_commit_batch
+
+from foodgram import constants
+
+RecipeTag = Recipe.tags.through
+
+
+def bitmap_from_ids(ids):
+    """Собирает битовую карту, в которой бит с номером ID установлен."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    # Сборка через байты линейна, в отличие от сдвигов большого числа.
+    data = bytearray(max(ids) // 8 + 1)
+    for object_id in ids:
+        data[object_id >> 3] |= 1 << (object_id & 7)
+    return int.from_bytes(data, 'little')
+
+
+class TagBitmapSnapshot:
+    """Неизменяемый снимок битовых карт рецептов по тегам."""
+
+    __slots__ = ('tags', 'bitmaps', 'slugs', 'version')
+
+    def __init__(self, tags, bitmaps, version):
+        self.tags = tags
+        self.bitmaps = bitmaps
+        self.slugs = {tag['slug']: tag['id'] for tag in tags}
+        self.version = version
+
+    def replace(self, recipe_id, tag_ids):
+        """Возвращает снимок, в котором у рецепта указанные теги."""
+        bit = 1 << recipe_id
+        bitmaps = {
+            tag_id: bitmap | bit if tag_id in tag_ids else bitmap & ~bit
+            for tag_id, bitmap in self.bitmaps.items()
+        }
+        return TagBitmapSnapshot(self.tags, bitmaps, self.version)
+
+
+class TagBitmapIndex(VersionedSnapshot):
+    """Битовые карты ID рецептов для каждого тега в памяти процесса.
+
+    Бит с номером ID рецепта установлен в карте тега, если у рецепта есть
+    этот тег, поэтому подсчет фасетов сводится к пересечению карт.
+    """
+
+    def get_version(self):
+        """Возвращает версию рецептов, тегов и связей между ними."""
+        links = RecipeTag.objects.aggregate(count=Count('pk'), last=Max('pk'))
+        return (
+            get_model_version(Recipe),
+            get_model_version(Tag),
+            links['count'],
+            links['last'],
+        )
+
+    def build(self, version):
+        """Строит битовые карты по таблице связей рецептов и тегов."""
+        tags = list(Tag.objects.order_by('id').values('id', 'name', 'slug'))
+        recipe_ids = {tag['id']: [] for tag in tags}
+        for tag_id, recipe_id in RecipeTag.objects.values_list(
+                'tag_id', 'recipe_id').iterator():
+            recipe_ids[tag_id].append(recipe_id)
+        bitmaps = {
+            tag_id: bitmap_from_ids(ids) for tag_id, ids in recipe_ids.items()
+        }
+        return TagBitmapSnapshot(tags, bitmaps, version)
+
+    def _update(self, recipe_id, tag_ids):
+        """Меняет теги рецепта в снимке, если он уже построен."""
+        self.apply(
+            lambda snapshot: snapshot.replace(recipe_id, tag_ids))
+
+    def schedule_update(self, recipe_id, tag_ids):
+        """Обновляет теги рецепта после фиксации транзакции."""
+        tag_ids = set(tag_ids)
+        transaction.on_commit(lambda: self._update(recipe_id, tag_ids))
+
+    def _sync(self, recipe_ids):
+        """Запоминает версию данных, не меняя карт."""
+        self.apply(lambda snapshot: snapshot)
+
+    def schedule_sync(self, recipe_id):
+        """Запоминает версию данных после сохранения рецепта.
+
+        Сохранение рецепта меняет версию, но не его теги, поэтому снимок
+        остается актуальным и не перестраивается.
+        """
+        on_commit_batch(self._sync, [recipe_id])
+
+    def schedule_delete(self, recipe_id):
+        """Убирает рецепт из карт после фиксации транзакции."""
+        transaction.on_commit(lambda: self._update(recipe_id, set()))
+
+    def facets(self, bitmap=None, slugs=()):
+        """Считает рецепты каждого тега в текущей выдаче.
+
+        Выдача — рецепты из карты bitmap, у которых есть хотя бы один из
+        тегов slugs; пустые bitmap и slugs выдачу не ограничивают.
+        """
+        snapshot = self.get_snapshot()
+        if slugs:
+            selected = 0
+            for slug in slugs:
+                selected |= snapshot.bitmaps.get(snapshot.slugs.get(slug), 0)
+            bitmap = selected if bitmap is None else bitmap & selected
+        return [
+            {
+                **tag,
+                'count': (
+                    snapshot.bitmaps[tag['id']] if bitmap is None
+                    else snapshot.bitmaps[tag['id']] & bitmap
+                ).bit_count(),
+            }
+            for tag in snapshot.tags
+        ]
+
+
+tag_index = TagBitmapIndex(
+    check_interval=constants.TAG_INDEX_CHECK_INTERVAL,
+)
@@ -1,16 +1,88 @@
-import base64
+import binascii
+from base64 import b64decode
+from tempfile import SpooledTemporaryFile
 
-from django.core.files.base import ContentFile
+from api.images import get_variant_url
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.validators import validate_image_file_extension
+from PIL import Image, UnidentifiedImageError
 from rest_framework import serializers
 
+from foodgram import constants
+
 
 class Base64ImageField(serializers.ImageField):
-    """Сериализатор для обработки изображений в формате Base64."""
+    """Сериализатор для обработки изображений в формате Base64.
+
+    Размер проверяется до декодирования, данные декодируются частями во
+    временный файл, а на потоке запроса читается только заголовок
+    изображения. Полная проверка и перекодирование выполняются в фоне
+    после сохранения файла, см. api.images.
+
+    Для ответа можно указать вариант уменьшенной копии: пока она не
+    создана, отдается URL оригинала.
+    """
+
+    default_error_messages = {
+        'too_large': 'Размер изображения превышает {max_size} байт.',
+        'invalid_base64': 'Некорректные данные изображения в Base64.',
+    }
+
+    def __init__(self, variant=None, **kwargs):
+        # Вариант из constants.IMAGE_VARIANTS, отдаваемый вместо оригинала.
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        """Возвращает URL производного файла, если он уже создан."""
+        if value and self.variant:
+            url = get_variant_url(value, self.variant)
+            if url is not None:
+                request = self.context.get('request')
+                return request.build_absolute_uri(url) if request else url
+        return super().to_representation(value)
 
     def to_internal_value(self, data):
         """Преобразует данные из формата Base64 в файл изображения."""
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name=f'temp.{ext}')
-        return super().to_internal_value(data)
+        if not (isinstance(data, str) and data.startswith('data:image')):
+            return super().to_internal_value(data)
+        _, imgstr = data.split(';base64,')
+        if len(imgstr) // 4 * 3 > constants.IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=constants.IMAGE_MAX_SIZE)
+        buffer = self.decode(imgstr)
+        try:
+            # Image.open читает только заголовок, без декодирования пикселей.
+            image_format = Image.open(buffer).format
+        except (UnidentifiedImageError, OSError):
+            self.fail('invalid_image')
+        # Расширение файла определяется форматом, а не типом из data URI,
+        # чтобы под видом изображения не сохранить, например, HTML.
+        ext = constants.IMAGE_FORMAT_EXTENSIONS.get(image_format)
+        if ext is None:
+            self.fail('invalid_image')
+        file = File(buffer, name=f'temp.{ext}')
+        try:
+            validate_image_file_extension(file)
+        except ValidationError:
+            self.fail('invalid_image')
+        file.seek(0)
+        return serializers.FileField.to_internal_value(self, file)
+
+    def decode(self, imgstr):
+        """Декодирует Base64 частями во временный файл."""
+        if len(imgstr) % 4:
+            self.fail('invalid_base64')
+        buffer = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        chunk_size = constants.BASE64_CHUNK_SIZE
+        try:
+            for start in range(0, len(imgstr), chunk_size):
+                buffer.write(b64decode(
+                    imgstr[start:start + chunk_size], validate=True))
+        except binascii.Error:
+            buffer.close()
+            self.fail('invalid_base64')
+        buffer.seek(0)
+        return buffer
@@ -1,5 +1,12 @@
-from django_filters.rest_framework import BooleanFilter, FilterSet
+from api.membership import FAVORITES, SHOPPING_CART, membership_cache
+from api.pagination import KeysetPagination
+from api.search import recipe_search
+from django.db.models import Case, IntegerField, When
+from django_filters.rest_framework import BooleanFilter, CharFilter, FilterSet
 from recipes.models import Recipe
+from rest_framework.exceptions import ValidationError
+
+from foodgram import constants
 
 
 class RecipeFilter(FilterSet):
@@ -7,21 +14,54 @@ class RecipeFilter(FilterSet):
 
     is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart')
     is_favorited = BooleanFilter(method='filter_is_favorited')
+    search = CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ['is_in_shopping_cart', 'is_favorited']
+        fields = ['is_in_shopping_cart', 'is_favorited', 'search']
+
+    def filter_by_membership(self, queryset, kind, lookup):
+        """Фильтрует рецепты по ID из кэша или через JOIN для больших
+        множеств."""
+        user = self.request.user
+        recipe_ids = getattr(membership_cache.get(user), kind)
+        if len(recipe_ids) > constants.MEMBERSHIP_FILTER_MAX_IDS:
+            return queryset.filter(**{lookup: user})
+        return queryset.filter(id__in=recipe_ids)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         """Фильтрует рецепты по наличию в корзине покупок."""
         user = self.request.user
         if user.is_authenticated and value:
-            return queryset.filter(in_shopping_cart__user=user)
+            return self.filter_by_membership(
+                queryset, SHOPPING_CART, 'in_shopping_cart__user')
         return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         """Фильтрует рецепты по наличию в избранном."""
         user = self.request.user
         if user.is_authenticated and value:
-            return queryset.filter(favorited_by__user=user)
+            return self.filter_by_membership(
+                queryset, FAVORITES, 'favorited_by__user')
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Оставляет найденные рецепты в порядке релевантности.
+
+        Фильтр объявлен последним, поэтому лучшие по рангу рецепты
+        выбираются после остальных фильтров. Курсорная пагинация
+        упорядочивает рецепты по ID и с поиском не сочетается.
+        """
+        if KeysetPagination.cursor_query_param in self.request.query_params:
+            raise ValidationError(
+                {'cursor': 'Курсор нельзя передавать вместе с поиском.'})
+        recipe_ids = recipe_search.filter(queryset, value)
+        if not recipe_ids:
+            return queryset.none()
+        return queryset.filter(id__in=recipe_ids).annotate(
+            search_rank=Case(
+                *(When(id=recipe_id, then=rank)
+                  for rank, recipe_id in enumerate(recipe_ids)),
+                output_field=IntegerField(),
+            )
+        ).order_by('search_rank', 'id')
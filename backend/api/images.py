@@ -0,0 +1,185 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from foodgram import constants
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=constants.IMAGE_WORKERS,
+    thread_name_prefix='images',
+)
+# Ограничивает очередь задач, чтобы всплеск загрузок не копил память.
+queue_slots = threading.BoundedSemaphore(constants.IMAGE_QUEUE_SIZE)
+
+
+def derivative_name(name, variant):
+    """Возвращает имя производного файла рядом с оригиналом."""
+    root, _ = os.path.splitext(name)
+    return f'{root}_{variant}.{constants.IMAGE_VARIANT_EXTENSION}'
+
+
+def get_variant_url(field_file, variant):
+    """Возвращает URL производного файла или None, если его еще нет."""
+    name = derivative_name(field_file.name, variant)
+    if field_file.storage.exists(name):
+        return field_file.storage.url(name)
+    return None
+
+
+def write_file(storage, name, content):
+    """Записывает файл в хранилище, заменяя существующий."""
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        storage.delete(name)
+        storage.save(name, ContentFile(content))
+        return
+    # Замена через временный файл не дает отдать недописанный файл.
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+
+def generate_derivatives(storage, name, image):
+    """Сохраняет уменьшенные копии изображения в формате WebP."""
+    for variant, size in constants.IMAGE_VARIANTS.items():
+        derivative = image.copy()
+        derivative.thumbnail(size)
+        if derivative.mode not in ('RGB', 'RGBA'):
+            derivative = derivative.convert('RGBA')
+        buffer = BytesIO()
+        derivative.save(
+            buffer,
+            format=constants.IMAGE_VARIANT_FORMAT,
+            quality=constants.IMAGE_VARIANT_QUALITY,
+        )
+        write_file(storage, derivative_name(name, variant), buffer.getvalue())
+
+
+def delete_derivatives(field_file):
+    """Удаляет производные файлы изображения."""
+    for variant in constants.IMAGE_VARIANTS:
+        field_file.storage.delete(derivative_name(field_file.name, variant))
+
+
+def delete_unused_image(storage, name, model, field_name):
+    """Удаляет файл изображения и его копии, если на файл не ссылается ни
+    один объект."""
+    if model.objects.filter(**{field_name: name}).exists():
+        return
+    for variant in constants.IMAGE_VARIANTS:
+        storage.delete(derivative_name(name, variant))
+    storage.delete(name)
+
+
+def schedule_image_deletion(field_file):
+    """Планирует удаление замененного изображения после фиксации
+    транзакции."""
+    if not field_file:
+        return
+    args = (
+        field_file.storage,
+        field_file.name,
+        type(field_file.instance),
+        field_file.field.attname,
+    )
+    transaction.on_commit(lambda: delete_unused_image(*args))
+
+
+def open_image(storage, name):
+    """Открывает изображение из хранилища и полностью декодирует его."""
+    with storage.open(name) as file, Image.open(file) as image:
+        image_format = image.format
+        image.load()
+        return ImageOps.exif_transpose(image), image_format
+
+
+def reject_image(storage, name, model, pk, field_name):
+    """Удаляет файл, не прошедший проверку, и очищает поле объекта.
+
+    Поле очищается, только если объект все еще ссылается на этот файл.
+    """
+    instance = model.objects.filter(pk=pk, **{field_name: name}).first()
+    if instance is not None:
+        setattr(instance, field_name, '')
+        instance.save()
+    storage.delete(name)
+
+
+def process_image(storage, name, model, pk, field_name):
+    """Проверяет изображение полным декодированием, перекодирует его и
+    создает производные файлы.
+
+    Перекодирование применяет поворот из EXIF и удаляет метаданные.
+    Файлы заменяются атомарно, поэтому до завершения обработки
+    отдается сохраненный оригинал. Изображение, которое не удалось
+    декодировать, удаляется вместе со ссылкой на него.
+    """
+    try:
+        image, image_format = open_image(storage, name)
+    except FileNotFoundError:
+        # Файл уже заменен или удален.
+        return
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        logger.warning('Изображение %s не прошло проверку', name)
+        reject_image(storage, name, model, pk, field_name)
+        return
+    options = {'optimize': True}
+    if image_format == 'JPEG':
+        options['quality'] = constants.IMAGE_JPEG_QUALITY
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    write_file(storage, name, buffer.getvalue())
+    generate_derivatives(storage, name, image)
+
+
+def run_task(task, *args):
+    """Выполняет задачу обработки и освобождает место в очереди."""
+    try:
+        task(*args)
+    except Exception:
+        logger.exception('Ошибка фоновой обработки изображения %s', args)
+    finally:
+        queue_slots.release()
+        connections.close_all()
+
+
+def submit(task, *args):
+    """Ставит задачу в очередь или выполняет ее сразу, если очередь
+    заполнена.
+
+    Задача не пропускается: иначе непроверенный файл так и отдавался
+    бы клиентам.
+    """
+    if not queue_slots.acquire(blocking=False):
+        logger.warning('Очередь обработки изображений заполнена: %s', args)
+        try:
+            task(*args)
+        except Exception:
+            logger.exception('Ошибка обработки изображения %s', args)
+        return
+    executor.submit(run_task, task, *args)
+
+
+def schedule_image_processing(field_file):
+    """Планирует обработку файла изображения после фиксации транзакции."""
+    if not field_file:
+        return
+    instance = field_file.instance
+    args = (
+        field_file.storage,
+        field_file.name,
+        type(instance),
+        instance.pk,
+        field_file.field.attname,
+    )
+    transaction.on_commit(lambda: submit(process_image, *args))
@@ -0,0 +1,182 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from django.db.models import Count, Max
+from recipes.models import Ingredient
+
+from foodgram import constants
+
+# Символ больше любого символа названия: верхняя граница диапазона префикса.
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+
+class IngredientSnapshot:
+    """Неизменяемый снимок ингредиентов, отсортированный по названию.
+
+    Для списка без фильтра по имени хранится также порядок по ID, как у
+    queryset представления.
+    """
+
+    __slots__ = ('keys', 'rows', 'rows_by_id', 'version')
+
+    def __init__(self, rows, version):
+        self.rows_by_id = sorted(rows, key=lambda row: row['id'])
+        rows = sorted(
+            rows, key=lambda row: (row['name'].casefold(), row['id']))
+        self.keys = [row['name'].casefold() for row in rows]
+        self.rows = rows
+        self.version = version
+
+
+class VersionedSnapshot:
+    """Снимок данных в памяти процесса, перестраиваемый по версии.
+
+    Снимок сбрасывается сигналами об изменениях в текущем процессе или
+    обновляется ими на месте через apply, а изменения из других процессов
+    обнаруживаются сравнением версии данных не чаще раза в check_interval
+    секунд. Снимок строится вне блокировки чтения: пока один поток
+    перестраивает его, остальные получают предыдущий.
+    """
+
+    # Все снимки процесса, чтобы сбросить их разом.
+    instances = weakref.WeakSet()
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._version = None
+        self._checked_at = 0
+        # Число изменений, примененных через apply.
+        self._changes = 0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        VersionedSnapshot.instances.add(self)
+
+    def get_version(self):
+        """Возвращает версию данных в базе."""
+        raise NotImplementedError
+
+    def build(self, version):
+        """Строит снимок из базы."""
+        raise NotImplementedError
+
+    def get_snapshot(self):
+        """Возвращает актуальный снимок, перестраивая его при необходимости."""
+        snapshot = self._snapshot
+        if (snapshot is not None
+                and time.monotonic() - self._checked_at < self.check_interval):
+            return snapshot
+        # Без снимка ждем его построения, иначе проверку выполняет один
+        # поток, а остальные отдают предыдущий снимок.
+        if not self._build_lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            return self._refresh()
+        finally:
+            self._build_lock.release()
+
+    def _refresh(self):
+        """Сверяет версию и при расхождении строит снимок заново."""
+        now = time.monotonic()
+        with self._lock:
+            snapshot, changes = self._snapshot, self._changes
+            if snapshot is not None and now - self._checked_at < (
+                    self.check_interval):
+                # Снимок обновил другой поток, пока этот ждал.
+                return snapshot
+        version = self.get_version()
+        if snapshot is not None and self._version == version:
+            with self._lock:
+                self._checked_at = now
+            return snapshot
+        built = self.build(version)
+        with self._lock:
+            if self._changes != changes:
+                # Во время построения применено изменение, которого в
+                # новом снимке может не быть: следующий запрос проверит
+                # версию снова.
+                self._snapshot, self._version = built, None
+                self._checked_at = 0
+            else:
+                self._snapshot, self._version = built, version
+                self._checked_at = now
+            return built
+
+    def apply(self, change):
+        """Применяет изменение к построенному снимку.
+
+        change получает снимок и возвращает обновленный. После изменения
+        запоминается текущая версия данных, чтобы собственные изменения
+        процесса не приводили к полному перестроению снимка.
+        """
+        if self._snapshot is None:
+            return
+        version = self.get_version()
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot = change(self._snapshot)
+                self._version = version
+                self._changes += 1
+
+    def invalidate(self):
+        """Помечает снимок устаревшим."""
+        with self._lock:
+            self._snapshot = None
+
+    @classmethod
+    def invalidate_all(cls):
+        """Помечает устаревшими все снимки процесса."""
+        for snapshot in list(cls.instances):
+            snapshot.invalidate()
+
+
+def get_model_version(model):
+    """Возвращает версию таблицы: количество строк и время изменения."""
+    stats = model.objects.aggregate(
+        count=Count('pk'), updated_at=Max('updated_at'))
+    return stats['count'], stats['updated_at']
+
+
+class IngredientPrefixIndex(VersionedSnapshot):
+    """Индекс ингредиентов в памяти для автодополнения по названию.
+
+    Поиск по префиксу выполняется бинарным поиском по отсортированным
+    названиям в нижнем регистре.
+    """
+
+    def get_version(self):
+        """Возвращает версию таблицы ингредиентов."""
+        return get_model_version(Ingredient)
+
+    def build(self, version):
+        """Строит снимок ингредиентов из базы."""
+        rows = Ingredient.objects.values('id', 'name', 'measurement_unit')
+        return IngredientSnapshot(list(rows), version)
+
+    def search(self, query, limit=None):
+        """Ищет ингредиенты: точные совпадения, затем префиксные, затем
+        вхождения подстроки."""
+        snapshot = self.get_snapshot()
+        query = query.casefold()
+        if not query:
+            return snapshot.rows_by_id[:limit]
+        start = bisect_left(snapshot.keys, query)
+        end = bisect_left(snapshot.keys, query + PREFIX_UPPER_BOUND, start)
+        # Точное совпадение сортируется раньше остальных названий с тем же
+        # префиксом, поэтому диапазон уже упорядочен по рангу.
+        results = snapshot.rows[start:end]
+        if limit is not None and len(results) >= limit:
+            return results[:limit]
+        for key, row in zip(snapshot.keys, snapshot.rows):
+            if query in key and not key.startswith(query):
+                results.append(row)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+
+ingredient_index = IngredientPrefixIndex(
+    check_interval=constants.INGREDIENT_INDEX_CHECK_INTERVAL,
+)
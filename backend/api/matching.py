@@ -0,0 +1,159 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+
+from api.indexes import VersionedSnapshot, get_model_version
+from django.db.models import Count, Max
+from recipes.models import Recipe, RecipeIngredient
+from recipes.transactions import on_commit_batch
+
+from foodgram import constants
+
+# Тип элементов списков рецептов: 64-битные целые со знаком.
+POSTING_TYPE = 'q'
+
+
+class PostingsSnapshot:
+    """Обратный индекс ингредиентов: отсортированные ID рецептов для
+    каждого ингредиента и ингредиенты каждого рецепта."""
+
+    __slots__ = ('postings', 'ingredients', 'version')
+
+    def __init__(self, postings, ingredients, version):
+        self.postings = postings
+        self.ingredients = ingredients
+        self.version = version
+
+    def replace(self, recipe_id, ingredient_ids):
+        """Заменяет ингредиенты рецепта в индексе.
+
+        Списки рецептов не изменяются, а заменяются новыми, поэтому
+        параллельный подбор читает либо старый, либо новый список.
+        """
+        old = set(self.ingredients.get(recipe_id, ()))
+        new = set(ingredient_ids)
+        for ingredient_id in old - new:
+            postings = self.postings[ingredient_id]
+            position = bisect_left(postings, recipe_id)
+            self.postings[ingredient_id] = (
+                postings[:position] + postings[position + 1:])
+        for ingredient_id in new - old:
+            postings = self.postings.get(
+                ingredient_id, array(POSTING_TYPE))
+            position = bisect_left(postings, recipe_id)
+            self.postings[ingredient_id] = (
+                postings[:position] + array(POSTING_TYPE, [recipe_id])
+                + postings[position:])
+        if new:
+            self.ingredients[recipe_id] = tuple(new)
+        else:
+            self.ingredients.pop(recipe_id, None)
+
+
+class RecipeMatches(Sequence):
+    """Рецепты, ранжированные по покрытию ингредиентами.
+
+    Элемент — кортеж (ID рецепта, найдено, не хватает). Первыми идут
+    рецепты с наименьшим числом недостающих ингредиентов, затем с
+    наибольшим числом найденных, затем новые. Срез выбирает лучшие
+    элементы через кучу, не сортируя все совпадения.
+    """
+
+    def __init__(self, matched, ingredients, max_missing=None):
+        self.keys = []
+        for recipe_id, found in matched.items():
+            missing = len(ingredients.get(recipe_id, ())) - found
+            if max_missing is None or missing <= max_missing:
+                self.keys.append((missing, -found, -recipe_id))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(len(self.keys))
+        return [
+            (-recipe_id, -found, missing)
+            for missing, found, recipe_id in heapq.nsmallest(
+                stop, self.keys)[start:stop]
+        ]
+
+
+class IngredientPostingsIndex(VersionedSnapshot):
+    """Обратный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Подбор рецептов по имеющимся ингредиентам считает совпадения по
+    спискам рецептов выбранных ингредиентов, не группируя строки
+    RecipeIngredient в базе при каждом запросе.
+    """
+
+    def get_version(self):
+        """Возвращает версию рецептов и их ингредиентов."""
+        items = RecipeIngredient.objects.aggregate(
+            count=Count('pk'), last=Max('pk'))
+        return get_model_version(Recipe), items['count'], items['last']
+
+    def build(self, version):
+        """Строит списки рецептов по таблице ингредиентов рецептов."""
+        postings = defaultdict(list)
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.order_by(
+                'recipe_id').values_list(
+                'recipe_id', 'ingredient_id').iterator():
+            postings[ingredient_id].append(recipe_id)
+            ingredients[recipe_id].append(ingredient_id)
+        return PostingsSnapshot(
+            {
+                ingredient_id: array(POSTING_TYPE, recipe_ids)
+                for ingredient_id, recipe_ids in postings.items()
+            },
+            {
+                recipe_id: tuple(ingredient_ids)
+                for recipe_id, ingredient_ids in ingredients.items()
+            },
+            version,
+        )
+
+    def _update(self, recipe_ids):
+        """Перечитывает ингредиенты рецептов, если снимок уже построен."""
+        if self._snapshot is None:
+            return
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids).values_list(
+                'recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+
+        def change(snapshot):
+            for recipe_id in recipe_ids:
+                snapshot.replace(recipe_id, ingredients[recipe_id])
+            return snapshot
+
+        self.apply(change)
+
+    def schedule_update(self, recipe_id):
+        """Переиндексирует рецепт после фиксации транзакции, один раз
+        за транзакцию."""
+        on_commit_batch(self._update, [recipe_id])
+
+    def schedule_delete(self, recipe_id):
+        """Убирает рецепт из индекса после фиксации транзакции."""
+        # У удаленного рецепта нет строк ингредиентов, и перечитывание
+        # убирает его из списков.
+        on_commit_batch(self._update, [recipe_id])
+
+    def match(self, ingredient_ids, max_missing=None):
+        """Возвращает рецепты хотя бы с одним из ингредиентов по рангу."""
+        snapshot = self.get_snapshot()
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(snapshot.postings.get(ingredient_id, ()))
+        return RecipeMatches(matched, snapshot.ingredients, max_missing)
+
+
+ingredient_postings = IngredientPostingsIndex(
+    check_interval=constants.MATCH_INDEX_CHECK_INTERVAL,
+)
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+from foodgram import constants
+
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+SUBSCRIPTIONS = 'subscriptions'
+
+
+class UserMembership:
+    """Множества ID избранного, корзины и подписок одного пользователя."""
+
+    __slots__ = (FAVORITES, SHOPPING_CART, SUBSCRIPTIONS, 'version',
+                 'loaded_at')
+
+    def __init__(self, user_id, version):
+        self.favorites = set(
+            Favorite.objects.filter(
+                user_id=user_id).values_list('recipe_id', flat=True))
+        self.shopping_cart = set(
+            ShoppingCart.objects.filter(
+                user_id=user_id).values_list('recipe_id', flat=True))
+        self.subscriptions = set(
+            Subscription.objects.filter(
+                user_id=user_id).values_list('author_id', flat=True))
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+
+class MembershipCache:
+    """Кэш принадлежности рецептов и авторов пользователям.
+
+    Хранит не больше max_users записей в порядке последнего обращения.
+    Запись действительна, пока ее версия совпадает с версией отметок
+    пользователя: версия читается из базы вместе с пользователем при
+    аутентификации, поэтому изменения из других процессов видны сразу.
+    Через timeout секунд запись перечитывается в любом случае.
+    """
+
+    def __init__(self, max_users, timeout):
+        self.max_users = max_users
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user):
+        """Возвращает множества пользователя, загружая их при отсутствии
+        или устаревании."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user.id)
+            if (entry is not None
+                    and entry.version == user.membership_version
+                    and now - entry.loaded_at < self.timeout):
+                self._entries.move_to_end(user.id)
+                return entry
+        entry = UserMembership(user.id, user.membership_version)
+        with self._lock:
+            self._entries[user.id] = entry
+            self._entries.move_to_end(user.id)
+            self._evict(now)
+        return entry
+
+    def _evict(self, now):
+        """Удаляет устаревшие записи и записи сверх лимита."""
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if (len(self._entries) <= self.max_users
+                    and now - entry.loaded_at < self.timeout):
+                break
+            del self._entries[user_id]
+
+    def invalidate(self, user_id=None):
+        """Сбрасывает запись пользователя или весь кэш."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+membership_cache = MembershipCache(
+    max_users=constants.MEMBERSHIP_CACHE_MAX_USERS,
+    timeout=constants.MEMBERSHIP_CACHE_TIMEOUT,
+)
@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+from foodgram import constants
+
+PREFIX = 'foodgram'
+REQUESTS = 'http_requests_total'
+CACHE_REQUESTS = 'response_cache_requests_total'
+# Счетчик: описание и имена меток.
+COUNTERS = {
+    REQUESTS: ('Количество запросов', ('route', 'method', 'status')),
+    CACHE_REQUESTS: (
+        'Обращения к кэшу ответов анонимным пользователям',
+        ('cache', 'result')),
+}
+# Гистограмма: описание и верхние границы корзин.
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Время обработки запроса', constants.METRICS_LATENCY_BUCKETS),
+    'db_queries': (
+        'Количество SQL-запросов за запрос', constants.METRICS_QUERY_BUCKETS),
+    'db_query_duration_seconds': (
+        'Время SQL-запросов за запрос', constants.METRICS_LATENCY_BUCKETS),
+    'http_response_size_bytes': (
+        'Размер тела ответа', constants.METRICS_SIZE_BUCKETS),
+}
+
+
+def is_alive(pid):
+    """Проверяет, работает ли процесс с указанным PID."""
+    if os.name == 'nt':
+        # os.kill в Windows не проверяет процесс, а завершает его.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def file_pid(path):
+    """Возвращает PID процесса из имени файла метрик или None."""
+    try:
+        return int(path.stem.split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+def new_histogram(buckets):
+    """Возвращает пустую гистограмму: счетчики корзин, сумму и количество."""
+    return [0] * len(buckets) + [0, 0]
+
+
+def escape(value):
+    """Экранирует значение метки для формата Prometheus."""
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def format_labels(labels):
+    """Форматирует метки в виде {name="value",...}."""
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in labels) + '}'
+
+
+class MetricsStore:
+    """Метрики запросов процесса с обменом через файлы.
+
+    Процесс накапливает метрики в памяти и не чаще раза в flush_interval
+    секунд записывает их в свой файл в общем каталоге. При выдаче
+    суммируются файлы работающих процессов gunicorn; файлы завершенных
+    процессов удаляются при запуске нового.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._pid = None
+        self._name = None
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        """Начинает метрики процесса заново, в том числе после fork.
+
+        Имя файла содержит PID и время запуска, поэтому процесс с
+        повторно выданным PID не перезаписывает файл предыдущего.
+        """
+        self._pid = os.getpid()
+        self._name = f'{self._pid}-{time.time_ns()}.json'
+        self._counters = {name: defaultdict(int) for name in COUNTERS}
+        self._histograms = {name: {} for name in HISTOGRAMS}
+        self._cleaned = False
+
+    @property
+    def directory(self):
+        """Возвращает общий каталог файлов метрик."""
+        return Path(settings.METRICS_DIR)
+
+    def observe(self, route, method, status, **values):
+        """Учитывает завершенный запрос.
+
+        values содержит наблюдения гистограмм по их именам, значение None
+        пропускается.
+        """
+        key = (route, method)
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._start()
+            self._counters[REQUESTS][(route, method, str(status))] += 1
+            for name, value in values.items():
+                if value is None:
+                    continue
+                buckets = HISTOGRAMS[name][1]
+                histogram = self._histograms[name].get(key)
+                if histogram is None:
+                    histogram = self._histograms[name][key] = new_histogram(
+                        buckets)
+                for index, bound in enumerate(buckets):
+                    if value <= bound:
+                        histogram[index] += 1
+                histogram[-2] += value
+                histogram[-1] += 1
+        self.maybe_flush()
+
+    def increment(self, name, *labels):
+        """Увеличивает счетчик name со значениями меток labels."""
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._start()
+            self._counters[name][labels] += 1
+
+    def maybe_flush(self):
+        """Записывает метрики в файл, если прошел интервал."""
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Записывает метрики процесса в его файл."""
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._start()
+            name = self._name
+            cleanup = not self._cleaned
+            self._cleaned = True
+            data = {
+                **{
+                    name: [[list(key), value] for key, value in
+                           counters.items()]
+                    for name, counters in self._counters.items()
+                },
+                **{
+                    name: [[list(key), values] for key, values in
+                           histograms.items()]
+                    for name, histograms in self._histograms.items()
+                },
+            }
+            self._flushed_at = time.monotonic()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if cleanup:
+            self.remove_dead_files()
+        path = self.directory / name
+        temp_path = path.with_suffix('.tmp')
+        temp_path.write_text(json.dumps(data))
+        # Замена через временный файл не дает прочитать его частично.
+        os.replace(temp_path, path)
+
+    def is_stale(self, path):
+        """Проверяет, что файл метрик оставлен завершенным процессом."""
+        pid = file_pid(path)
+        if pid == self._pid:
+            # Тот же PID мог быть выдан раньше завершенному процессу.
+            return path.name != self._name
+        return pid is None or not is_alive(pid)
+
+    def live_files(self):
+        """Возвращает файлы метрик работающих процессов."""
+        return [
+            path for path in sorted(self.directory.glob('*.json'))
+            if not self.is_stale(path)
+        ]
+
+    def remove_dead_files(self):
+        """Удаляет файлы метрик завершенных процессов."""
+        for path in self.directory.glob('*.json'):
+            if self.is_stale(path):
+                path.unlink(missing_ok=True)
+
+    def collect(self):
+        """Суммирует метрики из файлов работающих процессов."""
+        self.flush()
+        counters = {name: defaultdict(int) for name in COUNTERS}
+        histograms = {name: {} for name in HISTOGRAMS}
+        for path in self.live_files():
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for name in COUNTERS:
+                for key, value in data.get(name, []):
+                    counters[name][tuple(key)] += value
+            for name in HISTOGRAMS:
+                for key, values in data.get(name, []):
+                    total = histograms[name].setdefault(
+                        tuple(key), [0] * len(values))
+                    for index, value in enumerate(values):
+                        total[index] += value
+        return counters, histograms
+
+    def render(self):
+        """Возвращает метрики в текстовом формате Prometheus."""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (description, label_names) in COUNTERS.items():
+            metric = f'{PREFIX}_{name}'
+            lines += [
+                f'# HELP {metric} {description}',
+                f'# TYPE {metric} counter',
+            ]
+            for key, value in sorted(counters[name].items()):
+                labels = format_labels(zip(label_names, key))
+                lines.append(f'{metric}{labels} {value}')
+        for name, (description, buckets) in HISTOGRAMS.items():
+            metric = f'{PREFIX}_{name}'
+            lines += [
+                f'# HELP {metric} {description}',
+                f'# TYPE {metric} histogram',
+            ]
+            for (route, method), values in sorted(histograms[name].items()):
+                labels = [('route', route), ('method', method)]
+                for bound, value in zip(buckets, values):
+                    lines.append(
+                        f'{metric}_bucket'
+                        f'{format_labels(labels + [("le", str(bound))])} '
+                        f'{value}')
+                lines += [
+                    f'{metric}_bucket'
+                    f'{format_labels(labels + [("le", "+Inf")])} '
+                    f'{values[-1]}',
+                    f'{metric}_sum{format_labels(labels)} {values[-2]}',
+                    f'{metric}_count{format_labels(labels)} {values[-1]}',
+                ]
+        return '\n'.join(lines) + '\n'
+
+
+metrics_store = MetricsStore(
+    flush_interval=constants.METRICS_FLUSH_INTERVAL,
+)
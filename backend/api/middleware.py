@@ -0,0 +1,78 @@
+import time
+
+from api.metrics import metrics_store
+from django.db import connection
+
+# Маршрут запросов, не сопоставленных ни с одним URL.
+UNMATCHED_ROUTE = 'unmatched'
+# Методы HTTP, учитываемые в метриках по имени; остальные объединяются в
+# метку OTHER_METHOD, чтобы клиент не мог плодить новые метки.
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+OTHER_METHOD = 'other'
+
+
+class QueryTimer:
+    """Обертка выполнения SQL, считающая запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Собирает метрики времени ответа, SQL-запросов и размера ответа.
+
+    Для потоковых ответов метрики учитываются после отдачи последней
+    части, так как запросы к базе выполняются во время чтения потока.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.wrap_stream(
+                request, response, response.streaming_content, timer,
+                started)
+        else:
+            self.observe(
+                request, response, timer, started, len(response.content))
+        return response
+
+    def wrap_stream(self, request, response, content, timer, started):
+        """Отдает поток ответа, считая его размер и запросы к базе."""
+        size = 0
+        try:
+            with connection.execute_wrapper(timer):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self.observe(request, response, timer, started, size)
+
+    def observe(self, request, response, timer, started, size):
+        """Передает наблюдения запроса в хранилище метрик."""
+        match = request.resolver_match
+        route = match.url_name if match else None
+        metrics_store.observe(
+            route or UNMATCHED_ROUTE,
+            (request.method if request.method in KNOWN_METHODS
+             else OTHER_METHOD),
+            response.status_code,
+            http_request_duration_seconds=time.perf_counter() - started,
+            db_queries=timer.count,
+            db_query_duration_seconds=timer.duration,
+            http_response_size_bytes=size,
+        )
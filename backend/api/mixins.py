@@ -1,5 +1,10 @@
+from api.membership import membership_cache
 from api.serializers import RecipeDemoSerializer
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from recipes.models import Recipe
 from rest_framework import status
 from rest_framework.response import Response
@@ -17,12 +22,105 @@ class AddDelMixin:
             try:
                 item = model.objects.get(user=user, recipe=recipe)
                 item.delete()
+                # Версия отметок в request.user уже устарела.
+                membership_cache.invalidate(user.id)
                 return Response(status=status.HTTP_204_NO_CONTENT)
             except model.DoesNotExist:
                 return Response(status=status.HTTP_400_BAD_REQUEST)
 
         _, created = model.objects.get_or_create(user=user, recipe=recipe)
         if created:
+            membership_cache.invalidate(user.id)
             serializer = RecipeDemoSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(status=status.HTTP_400_BAD_REQUEST)
+
+
+class CursorPaginationMixin:
+    """Миксин для перехода на курсорную пагинацию по параметру cursor.
+
+    Без параметра cursor используется обычная пагинация page/limit.
+    """
+
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        """Возвращает пагинатор, выбранный по параметрам запроса."""
+        if not hasattr(self, '_paginator'):
+            cursor_class = self.cursor_pagination_class
+            if (cursor_class is not None
+                    and cursor_class.cursor_query_param
+                    in self.request.query_params):
+                self._paginator = cursor_class()
+        return super().paginator
+
+
+class ConditionalGetMixin:
+    """Миксин для ответа 304 на условные GET-запросы без сериализации.
+
+    get_validators возвращает пару (ETag, Last-Modified) или None, если
+    проверка для запроса не применяется; Last-Modified может быть None.
+    По умолчанию валидаторы строятся по полю updated_at модели без
+    загрузки самих объектов.
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        """Возвращает ETag и время изменения ответа."""
+        model = self.queryset.model
+        name = model._meta.model_name
+        if self.action == 'retrieve':
+            pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+            try:
+                updated_at = model.objects.filter(pk=pk).values_list(
+                    'updated_at', flat=True).first()
+            except (TypeError, ValueError, ValidationError):
+                return None
+            if updated_at is None:
+                return None
+            return f'{name}-{pk}-{updated_at.timestamp()}', updated_at
+        stats = model.objects.aggregate(
+            count=Count('pk'), updated_at=Max('updated_at'))
+        if stats['updated_at'] is None:
+            return None
+        # Удаление строки не меняет наибольшее время изменения, поэтому
+        # список проверяется только по ETag, включающему количество.
+        return (
+            f'{name}-{stats["count"]}-{stats["updated_at"].timestamp()}',
+            None,
+        )
+
+    def conditional_response(self, request, build_response, *args, **kwargs):
+        """Возвращает 304 при совпадении валидаторов или полный ответ."""
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return build_response()
+        etag, last_modified = validators
+        etag = quote_etag(etag)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            return response
+        response = build_response()
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Возвращает список с поддержкой условных запросов."""
+        return self.conditional_response(
+            request,
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs),
+            *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Возвращает объект с поддержкой условных запросов."""
+        return self.conditional_response(
+            request,
+            lambda: super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs),
+            *args, **kwargs)
@@ -1,4 +1,20 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, PageNumberPagination,
+                                       _positive_int)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Сортировки списка рецептов по параметру ordering.
+RECIPE_ORDERINGS = {
+    'popular': ('-popularity', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
 
 
 class CustomPagination(PageNumberPagination):
@@ -6,3 +22,145 @@ class CustomPagination(PageNumberPagination):
 
     page_size = 10  # Количество объектов на странице
     page_size_query_param = 'limit'  # Параметр запроса для изменения размера
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по ключу сортировки без COUNT и OFFSET.
+
+    Курсор хранит значения полей сортировки последнего объекта страницы,
+    следующая страница выбирается условием «строго после курсора».
+    """
+
+    page_size = 10
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Возвращает страницу объектов, следующих за курсором."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_seek_filter(position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        # Лишний объект показывает, есть ли следующая страница.
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        """Возвращает размер страницы с учетом параметра limit."""
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_fields(self):
+        """Возвращает поля сортировки и признак обратного порядка."""
+        return [
+            (field.lstrip('-'), field.startswith('-'))
+            for field in self.ordering
+        ]
+
+    def get_seek_filter(self, position):
+        """Строит условие лексикографического сравнения с курсором."""
+        condition = Q()
+        equal = {}
+        for (field, descending), value in zip(self.get_fields(), position):
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def decode_cursor(self, request):
+        """Разбирает курсор из параметров запроса."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(position, list)
+                or len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, obj):
+        """Кодирует значения полей сортировки объекта в курсор."""
+        position = []
+        for field, _ in self.get_fields():
+            value = getattr(obj, field)
+            # isoformat сохраняет микросекунды, в отличие от DjangoJSONEncoder.
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def get_next_link(self):
+        """Возвращает ссылку на следующую страницу."""
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        """Возвращает страницу без общего количества объектов."""
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+
+class RecipeKeysetPagination(KeysetPagination):
+    """Курсорная пагинация рецептов от новых к старым или в порядке из
+    параметра ordering."""
+
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Выбирает сортировку по параметру ordering."""
+        self.ordering = RECIPE_ORDERINGS.get(
+            request.query_params.get('ordering'), type(self).ordering)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class UserKeysetPagination(KeysetPagination):
+    """Курсорная пагинация пользователей по ID."""
+
+    ordering = ('id',)
+
+
+class FeedKeysetPagination(KeysetPagination):
+    """Курсорная пагинация ленты, собранной из нескольких источников.
+
+    Каждый источник выбирается по курсору отдельно, затем страницы
+    источников сливаются по ключу сортировки. Объекты источников должны
+    иметь атрибуты created_at и recipe_id.
+    """
+
+    ordering = ('-created_at', '-recipe_id')
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """Возвращает страницу, слитую из страниц всех источников."""
+        results = []
+        has_next = False
+        for queryset in querysets:
+            results.extend(self.paginate_queryset(queryset, request, view))
+            has_next = has_next or self.has_next
+        results.sort(
+            key=lambda item: (item.created_at, item.recipe_id), reverse=True)
+        self.has_next = has_next or len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
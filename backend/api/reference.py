@@ -0,0 +1,45 @@
+import hashlib
+import json
+
+from api.indexes import VersionedSnapshot, get_model_version
+from recipes.models import Ingredient, Tag
+
+from foodgram import constants
+
+
+class ReferenceSnapshot:
+    """Сериализованный каталог тегов и ингредиентов."""
+
+    __slots__ = ('version', 'content')
+
+    def __init__(self, tags, ingredients):
+        payload = {'tags': tags, 'ingredients': ingredients}
+        digest = hashlib.sha256(
+            json.dumps(payload, ensure_ascii=False, sort_keys=True).encode())
+        self.version = digest.hexdigest()[:constants.REFERENCE_VERSION_LENGTH]
+        self.content = json.dumps(
+            {'version': self.version, **payload},
+            ensure_ascii=False,
+            separators=(',', ':'),
+        ).encode()
+
+
+class ReferenceData(VersionedSnapshot):
+    """Снимок справочных данных, версия которого — хэш содержимого."""
+
+    def get_version(self):
+        """Возвращает версию таблиц тегов и ингредиентов."""
+        return get_model_version(Tag), get_model_version(Ingredient)
+
+    def build(self, version):
+        """Строит снимок справочных данных из базы."""
+        return ReferenceSnapshot(
+            list(Tag.objects.order_by('id').values('id', 'name', 'slug')),
+            list(Ingredient.objects.order_by('id').values(
+                'id', 'name', 'measurement_unit')),
+        )
+
+
+reference_data = ReferenceData(
+    check_interval=constants.REFERENCE_DATA_CHECK_INTERVAL,
+)
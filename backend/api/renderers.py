@@ -0,0 +1,46 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class PlainDataRenderer(BaseRenderer):
+    """Базовый рендерер для форматов, отдаваемых потоком.
+
+    Сами файлы формируются во view, а рендерер нужен для согласования
+    формата и вывода ошибок.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Выводит данные ответа об ошибке в виде JSON-строки."""
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class PlainTextRenderer(PlainDataRenderer):
+    """Рендерер текстового формата."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(PlainDataRenderer):
+    """Рендерер формата CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PrometheusRenderer(PlainDataRenderer):
+    """Рендерер текстового формата метрик Prometheus."""
+
+    media_type = 'text/plain'
+    format = 'prometheus'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Выводит готовый текст метрик или ошибку в виде JSON-строки."""
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return super().render(data, accepted_media_type, renderer_context)
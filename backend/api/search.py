@@ -0,0 +1,329 @@
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from api.indexes import (PREFIX_UPPER_BOUND, VersionedSnapshot,
+                         get_model_version)
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from recipes.models import Recipe, RecipeIngredient
+from recipes.transactions import on_commit_batch
+
+from foodgram import constants
+
+SEARCH_TABLE = 'recipes_search'
+FIELDS = tuple(constants.SEARCH_WEIGHTS)
+TOKEN_RE = re.compile(r'\w+')
+# Разложенная NFKD буква «й»: «и» и знак краткости.
+SHORT_I = unicodedata.normalize('NFKD', 'й')
+INGREDIENT_NAMES = (
+    "COALESCE((SELECT group_concat(ingredient.name, ' ') "
+    'FROM recipes_recipeingredient item '
+    'JOIN recipes_ingredient ingredient '
+    'ON ingredient.id = item.ingredient_id '
+    "WHERE item.recipe_id = recipe.id), '')"
+)
+
+
+def fold(expression):
+    """Заменяет в SQL-выражении «ё» на «е».
+
+    Токенизатор FTS5 не убирает диакритику у кириллицы, поэтому «ё»
+    заменяется и здесь, и в функции normalize.
+    """
+    return f"replace(replace({expression}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+INDEX_SQL = (
+    f'INSERT INTO {SEARCH_TABLE} (rowid, {", ".join(FIELDS)}) '
+    f'SELECT recipe.id, {fold("recipe.name")}, {fold("recipe.text")}, '
+    f'{fold(INGREDIENT_NAMES)} FROM recipes_recipe recipe'
+)
+
+
+def normalize(text):
+    """Приводит текст к нижнему регистру без диакритических знаков.
+
+    Как и в индексе FTS5, «ё» заменяется на «е», а «й» остается
+    отдельной буквой.
+    """
+    text = unicodedata.normalize(
+        'NFKD', text.casefold().replace('ё', 'е')).replace(SHORT_I, 'й')
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    """Разбивает текст на нормализованные слова."""
+    return TOKEN_RE.findall(normalize(text))
+
+
+def chunks(items, size):
+    """Разбивает список на части не длиннее size."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class FTS5SearchIndex:
+    """Поиск рецептов по таблице SQLite FTS5 с ранжированием BM25.
+
+    Идентификатор строки таблицы совпадает с ID рецепта.
+    """
+
+    def get_match(self, query):
+        """Возвращает выражение MATCH для слов запроса или None."""
+        terms = tokenize(query)
+        if not terms:
+            return None
+        # Каждое слово ищется как префикс; в кавычках оно не разбирается
+        # как синтаксис запроса FTS5.
+        return ' AND '.join(f'"{term}"*' for term in terms)
+
+    def search(self, query, limit):
+        """Возвращает ID рецептов, содержащих все слова запроса."""
+        match = self.get_match(query)
+        if match is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, %s, %s, %s) LIMIT %s',
+                [match, *constants.SEARCH_WEIGHTS.values(),
+                 -1 if limit is None else limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, query, limit):
+        """Возвращает ID найденных рецептов из queryset.
+
+        Поиск выполняется в том же запросе, что и остальные фильтры,
+        поэтому limit лучших по рангу выбираются среди подходящих под них
+        рецептов.
+        """
+        match = self.get_match(query)
+        if match is None:
+            return []
+        table = queryset.model._meta.db_table
+        found = RawSQL(
+            f'SELECT rowid FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s', [match])
+        rank = RawSQL(
+            f'SELECT bm25({SEARCH_TABLE}, %s, %s, %s) FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND rowid = {table}.id',
+            [*constants.SEARCH_WEIGHTS.values(), match])
+        return list(
+            queryset.filter(id__in=found).annotate(
+                search_rank=rank).order_by('search_rank', 'id').values_list(
+                'id', flat=True)[:limit]
+        )
+
+    def _index(self, where='', params=()):
+        """Добавляет в таблицу рецепты, выбранные условием."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'{INDEX_SQL} {where}', params)
+
+    def update(self, recipe_ids):
+        """Переиндексирует рецепты."""
+        for chunk in chunks(
+                list(recipe_ids), constants.SEARCH_UPDATE_CHUNK_SIZE):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            self.delete(chunk)
+            self._index(f'WHERE recipe.id IN ({placeholders})', chunk)
+
+    def delete(self, recipe_ids):
+        """Удаляет рецепты из индекса."""
+        for chunk in chunks(
+                list(recipe_ids), constants.SEARCH_UPDATE_CHUNK_SIZE):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {SEARCH_TABLE} '
+                    f'WHERE rowid IN ({placeholders})', chunk)
+
+    def rebuild(self):
+        """Строит индекс заново по всем рецептам."""
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+            self._index()
+
+
+class SearchSnapshot:
+    """Инвертированный индекс рецептов для поиска в памяти.
+
+    Для каждого слова хранится взвешенная по полям частота в рецептах,
+    для каждого рецепта — взвешенная длина.
+    """
+
+    __slots__ = ('postings', 'terms', 'lengths', 'average_length')
+
+    def __init__(self, documents):
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        for recipe_id, fields in documents:
+            length = 0
+            for field, text in zip(FIELDS, fields):
+                weight = constants.SEARCH_WEIGHTS[field]
+                terms = tokenize(text)
+                length += weight * len(terms)
+                for term in terms:
+                    postings = self.postings[term]
+                    postings[recipe_id] = postings.get(recipe_id, 0) + weight
+            self.lengths[recipe_id] = length
+        self.terms = sorted(self.postings)
+        self.average_length = (
+            sum(self.lengths.values()) / len(self.lengths)
+            if self.lengths else 0)
+
+    def match(self, prefix):
+        """Возвращает частоты рецептов по всем словам с префиксом."""
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix + PREFIX_UPPER_BOUND, start)
+        frequencies = defaultdict(float)
+        for term in self.terms[start:end]:
+            for recipe_id, frequency in self.postings[term].items():
+                frequencies[recipe_id] += frequency
+        return frequencies
+
+
+class MemorySearchIndex(VersionedSnapshot):
+    """Поиск рецептов в памяти процесса, если FTS5 недоступен."""
+
+    def get_version(self):
+        """Возвращает версию таблицы рецептов."""
+        return get_model_version(Recipe)
+
+    def build(self, version):
+        """Строит индекс по всем рецептам."""
+        ingredients = defaultdict(list)
+        for recipe_id, name in RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient__name').iterator():
+            ingredients[recipe_id].append(name)
+        return SearchSnapshot(
+            (recipe_id, (name, text, ' '.join(ingredients[recipe_id])))
+            for recipe_id, name, text in Recipe.objects.values_list(
+                'id', 'name', 'text').iterator()
+        )
+
+    def search(self, query, limit):
+        """Возвращает ID рецептов, содержащих все слова запроса."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        snapshot = self.get_snapshot()
+        total = len(snapshot.lengths)
+        scores = None
+        for term in terms:
+            frequencies = snapshot.match(term)
+            if scores is not None:
+                frequencies = {
+                    recipe_id: frequency
+                    for recipe_id, frequency in frequencies.items()
+                    if recipe_id in scores
+                }
+                scores = {recipe_id: scores[recipe_id]
+                          for recipe_id in frequencies}
+            else:
+                scores = dict.fromkeys(frequencies, 0)
+            found = len(frequencies)
+            idf = math.log((total - found + 0.5) / (found + 0.5) + 1)
+            for recipe_id, frequency in frequencies.items():
+                norm = constants.BM25_K1 * (
+                    1 - constants.BM25_B + constants.BM25_B
+                    * snapshot.lengths[recipe_id] / snapshot.average_length)
+                scores[recipe_id] += idf * frequency * (
+                    constants.BM25_K1 + 1) / (frequency + norm)
+            if not scores:
+                return []
+        if limit is None:
+            return sorted(scores, key=lambda key: (-scores[key], key))
+        return heapq.nlargest(limit, scores, key=lambda key: (
+            scores[key], -key))
+
+    def filter(self, queryset, query, limit):
+        """Возвращает ID найденных рецептов из queryset.
+
+        Найденные рецепты проверяются по queryset частями в порядке
+        ранга, пока не наберется limit подходящих.
+        """
+        found = []
+        for chunk in chunks(self.search(query, None),
+                            constants.SEARCH_UPDATE_CHUNK_SIZE):
+            recipe_ids = set(queryset.filter(id__in=chunk).values_list(
+                'id', flat=True))
+            found.extend(
+                recipe_id for recipe_id in chunk if recipe_id in recipe_ids)
+            if len(found) >= limit:
+                break
+        return found[:limit]
+
+    def update(self, recipe_ids):
+        """Помечает индекс устаревшим."""
+        self.invalidate()
+
+    def delete(self, recipe_ids):
+        """Помечает индекс устаревшим."""
+        self.invalidate()
+
+    def rebuild(self):
+        """Помечает индекс устаревшим."""
+        self.invalidate()
+
+
+class RecipeSearch:
+    """Поиск рецептов через FTS5 или, без него, через индекс в памяти.
+
+    Переиндексация рецептов откладывается до фиксации транзакции, чтобы
+    учесть ингредиенты, записанные после сохранения рецепта.
+    """
+
+    def __init__(self):
+        self.fts = FTS5SearchIndex()
+        self.memory = MemorySearchIndex(
+            check_interval=constants.SEARCH_INDEX_CHECK_INTERVAL)
+        # Наличие таблицы FTS5 по имени базы данных.
+        self._has_fts = {}
+
+    @property
+    def backend(self):
+        """Возвращает используемый индекс."""
+        name = connection.settings_dict['NAME']
+        if name not in self._has_fts:
+            self._has_fts[name] = (
+                connection.vendor == 'sqlite' and SEARCH_TABLE
+                in connection.introspection.table_names())
+        return self.fts if self._has_fts[name] else self.memory
+
+    def search(self, query, limit=constants.SEARCH_MAX_RESULTS):
+        """Возвращает ID рецептов по убыванию релевантности.
+
+        Без limit возвращаются все найденные рецепты.
+        """
+        return self.backend.search(query, limit)
+
+    def filter(self, queryset, query, limit=constants.SEARCH_MAX_RESULTS):
+        """Возвращает ID рецептов из queryset по убыванию релевантности,
+        не больше limit."""
+        return self.backend.filter(queryset, query, limit)
+
+    def update(self, recipe_ids):
+        """Переиндексирует рецепты."""
+        self.backend.update(recipe_ids)
+
+    def schedule_update(self, recipe_ids):
+        """Переиндексирует рецепты после фиксации транзакции, один раз
+        за транзакцию."""
+        on_commit_batch(self.update, recipe_ids)
+
+    def delete(self, recipe_ids):
+        """Удаляет рецепты из индекса."""
+        self.backend.delete(recipe_ids)
+
+    def rebuild(self):
+        """Строит индекс заново."""
+        self.backend.rebuild()
+
+
+recipe_search = RecipeSearch()
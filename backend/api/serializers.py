@@ -1,12 +1,14 @@
 from api.fields import Base64ImageField
+from api.images import (delete_derivatives, schedule_image_deletion,
+                        schedule_image_processing)
+from api.membership import membership_cache
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from recipes import similarity
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
 from rest_framework import serializers
-from users.models import Subscription
 
 User = get_user_model()
 
@@ -33,14 +35,14 @@ class BaseCustomUserSerializer(UserSerializer):
         """Проверяет, подписан ли текущий пользователь на данного автора."""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return Subscription.objects.filter(
-                user=request.user, author=obj).exists()
+            return obj.id in membership_cache.get(
+                request.user).subscriptions
         return False
 
 
 class CustomUserSerializer(BaseCustomUserSerializer):
     """Сериализатор для пользователя с аватаром."""
-    avatar = Base64ImageField()
+    avatar = Base64ImageField(variant='small')
 
     class Meta(UserSerializer.Meta):
         model = User
@@ -65,13 +67,18 @@ class CustomUserSerializer(BaseCustomUserSerializer):
         """Обновляет данные пользователя, включая аватар."""
         if avatar := validated_data.get('avatar', None):
             if instance.avatar:
+                delete_derivatives(instance.avatar)
                 instance.avatar.delete()
             instance.avatar = avatar
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        if avatar:
+            schedule_image_processing(instance.avatar)
+        return instance
 
 
 class UserSubscriptionSerializer(BaseCustomUserSerializer):
     """Сериализатор для подписки на пользователя."""
+    avatar = Base64ImageField(variant='small', read_only=True)
     recipes_count = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
 
@@ -89,16 +96,18 @@ class UserSubscriptionSerializer(BaseCustomUserSerializer):
             'recipes',
         )
 
+    def get_is_subscribed(self, obj):
+        """Автор из подписок всегда отслеживается текущим пользователем."""
+        return True
+
     def get_recipes(self, obj):
         """Возвращает рецепты автора с учетом лимита."""
-        queryset = obj.recipes.all()
-        if limit := self.context.get('recipes_limit'):
-            queryset = queryset[: int(limit)]
-        return RecipeDemoSerializer(queryset, many=True).data
+        recipes = self.context['recipes_by_author'].get(obj.id, [])
+        return RecipeDemoSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
         """Возвращает количество рецептов автора."""
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 class CustomUserPasswordSerializer(serializers.Serializer):
@@ -144,6 +153,8 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 class RecipeDemoSerializer(serializers.ModelSerializer):
     """Сериализатор для мини-информации о рецепте."""
+    image = Base64ImageField(variant='small', read_only=True)
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
@@ -186,8 +197,10 @@ class RecipeSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     'Ингредиенты не могут повторяться.')
             ingredient_ids.add(ingredient_id)
-            if not Ingredient.objects.filter(id=ingredient_id).exists():
-                raise serializers.ValidationError('Ингредиент отсуствует.')
+        existing_ids = Ingredient.objects.filter(
+            id__in=ingredient_ids).values_list('id', flat=True)
+        if len(existing_ids) != len(ingredient_ids):
+            raise serializers.ValidationError('Ингредиент отсуствует.')
         return value
 
     def validate_tags(self, value):
@@ -202,6 +215,15 @@ class RecipeSerializer(serializers.ModelSerializer):
             tags.add(tag)
         return value
 
+    def validate(self, attrs):
+        """Проверяет, что ингредиенты и теги переданы и при обновлении."""
+        if 'recipeingredient_set' not in attrs:
+            raise serializers.ValidationError(
+                {'ingredients': 'Укажите ингредиенты.'})
+        if 'tags' not in attrs:
+            raise serializers.ValidationError({'tags': 'Укажите тег.'})
+        return super().validate(attrs)
+
     def recipe_ingredients_create(self, recipe, ingredients_data):
         """Создает ингредиенты для рецепта."""
         recipe_ingredients_to_create = [
@@ -212,43 +234,83 @@ class RecipeSerializer(serializers.ModelSerializer):
             for ingredient_data in ingredients_data
         ]
         RecipeIngredient.objects.bulk_create(recipe_ingredients_to_create)
+        # bulk_create не отправляет сигналы сохранения строк.
+        similarity.schedule_update(recipe.id)
 
     @transaction.atomic
     def create(self, validated_data):
         """Создает новый рецепт."""
         ingredients_data = validated_data.pop('recipeingredient_set')
         tags_data = validated_data.pop('tags')
-        image_data = validated_data.pop('image')
 
         recipe = Recipe.objects.create(**validated_data)
-        recipe.image.save(image_data.name, image_data, save=True)
+        schedule_image_processing(recipe.image)
 
         self.recipe_ingredients_create(recipe, ingredients_data)
 
         recipe.tags.set(tags_data)
         return recipe
 
+    def recipe_ingredients_update(self, recipe, ingredients_data):
+        """Приводит ингредиенты рецепта к новому списку.
+
+        Добавляет новые, обновляет изменившиеся количества и удаляет
+        исключенные ингредиенты, не трогая совпадающие строки.
+        """
+        amounts = {
+            ingredient_data['ingredient']['id']: ingredient_data['amount']
+            for ingredient_data in ingredients_data
+        }
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipeingredient_set.all()
+        }
+        to_delete = [
+            recipe_ingredient.id
+            for ingredient_id, recipe_ingredient in existing.items()
+            if ingredient_id not in amounts
+        ]
+        to_update = []
+        for ingredient_id, recipe_ingredient in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+        to_create = [
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        ]
+        if to_delete:
+            RecipeIngredient.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+        if to_delete or to_create:
+            similarity.schedule_update(recipe.id)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Обновляет существующий рецепт."""
-        tags_data = validated_data.pop('tags', None)
-        ingredients_data = validated_data.pop('recipeingredient_set', None)
-
-        self.validate_ingredients(ingredients_data)
-        self.validate_tags(tags_data)
+        tags_data = validated_data.pop('tags')
+        ingredients_data = validated_data.pop('recipeingredient_set')
 
+        old_image = instance.image
         instance = super().update(instance, validated_data)
-
-        if tags_data is not None:
-            instance.tags.set(tags_data)
-
-        if ingredients_data is not None:
-            instance.recipeingredient_set.all().delete()
-            self.recipe_ingredients_create(instance, ingredients_data)
-
+        if 'image' in validated_data:
+            if old_image.name != instance.image.name:
+                schedule_image_deletion(old_image)
+            schedule_image_processing(instance.image)
+        instance.tags.set(tags_data)
+        self.recipe_ingredients_update(instance, ingredients_data)
         return instance
 
     def to_representation(self, instance):
         """Преобразует представление рецепта для ответа."""
+        # Вариант изображения выбирает view, например, для списка.
+        self.fields['image'].variant = self.context.get('image_variant')
         representation = super().to_representation(instance)
         representation['tags'] = TagSerializer(
             instance.tags.all(), many=True).data
@@ -258,14 +320,13 @@ class RecipeSerializer(serializers.ModelSerializer):
         """Проверяет, добавлен ли рецепт в избранное."""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return Favorite.objects.filter(
-                user=request.user, recipe=obj).exists()
+            return obj.id in membership_cache.get(request.user).favorites
         return False
 
     def get_is_in_shopping_cart(self, obj):
         """Проверяет, находится ли рецепт в корзине покупок."""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return ShoppingCart.objects.filter(
-                user=request.user, recipe=obj).exists()
+            return obj.id in membership_cache.get(
+                request.user).shopping_cart
         return False
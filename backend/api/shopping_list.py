@@ -0,0 +1,60 @@
+import csv
+import json
+
+from django.db.models import Sum
+from recipes.models import RecipeIngredient, ShoppingCart
+
+FIELDS = ('name', 'measurement_unit', 'amount')
+
+
+def get_shopping_list(user):
+    """Возвращает итератор сумм ингредиентов из корзины пользователя."""
+    shopping_cart = ShoppingCart.objects.filter(
+        user=user).values_list('recipe', flat=True)
+    return (
+        RecipeIngredient.objects.filter(recipe__in=shopping_cart)
+        .values_list('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(total_amount=Sum('amount'))
+        .order_by('ingredient__name')
+        .iterator()
+    )
+
+
+def stream_text(rows):
+    """Выводит список покупок построчно в текстовом формате."""
+    yield 'Список покупок:\n\n'
+    for index, (name, unit, amount) in enumerate(rows, start=1):
+        yield f'{index}. {name} ({unit}) - {amount}\n'
+
+
+class EchoBuffer:
+    """Буфер, возвращающий записанную строку вместо ее хранения."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Выводит список покупок построчно в формате CSV."""
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_json(rows):
+    """Выводит список покупок массивом JSON по одному элементу."""
+    separator = '['
+    for row in rows:
+        yield separator + json.dumps(dict(zip(FIELDS, row)),
+                                     ensure_ascii=False)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+# Генератор содержимого для каждого формата выгрузки.
+STREAMS = {
+    'txt': stream_text,
+    'csv': stream_csv,
+    'json': stream_json,
+}
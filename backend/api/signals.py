@@ -0,0 +1,199 @@
+from api.cache import (GLOBAL_SCOPE, LIST_SCOPE, recipe_response_cache,
+                       recipe_scope)
+from api.facets import tag_index
+from api.indexes import ingredient_index
+from api.matching import ingredient_postings
+from api.reference import reference_data
+from api.search import recipe_search
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+# Поля, изменение которых не влияет на ответы API.
+RECIPE_SILENT_FIELDS = {'short_link'}
+USER_SILENT_FIELDS = {'last_login', 'password'}
+
+
+def is_silent_update(update_fields, silent_fields):
+    """Проверяет, что сохранение затронуло только служебные поля."""
+    return update_fields is not None and set(update_fields) <= silent_fields
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, update_fields=None, **kwargs):
+    """Сбрасывает кэш ответов при изменении рецепта."""
+    if is_silent_update(update_fields, RECIPE_SILENT_FIELDS):
+        return
+    recipe_response_cache.bump(LIST_SCOPE, recipe_scope(instance.pk))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_recipe_ingredient(sender, instance, **kwargs):
+    """Сбрасывает кэш ответов при изменении ингредиентов рецепта."""
+    recipe_response_cache.bump(LIST_SCOPE, recipe_scope(instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, **kwargs):
+    """Сбрасывает кэш ответов при изменении тегов рецепта."""
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        recipe_response_cache.bump(GLOBAL_SCOPE)
+        return
+    recipe_response_cache.bump(LIST_SCOPE, recipe_scope(instance.pk))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def invalidate_tag(sender, instance, **kwargs):
+    """Сбрасывает весь кэш ответов при изменении тега."""
+    Recipe.objects.filter(tags=instance).update(updated_at=timezone.now())
+    recipe_response_cache.bump(GLOBAL_SCOPE)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, update_fields=None,
+                      **kwargs):
+    """Сбрасывает кэш ответов с рецептами автора при изменении профиля."""
+    if created or is_silent_update(update_fields, USER_SILENT_FIELDS):
+        return
+    recipe_ids = list(
+        Recipe.objects.filter(author=instance).values_list('id', flat=True))
+    if recipe_ids:
+        # Профиль автора входит в ответ рецепта, поэтому рецепты
+        # считаются измененными для условных запросов.
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            updated_at=timezone.now())
+        recipe_response_cache.bump(
+            LIST_SCOPE,
+            *(recipe_scope(recipe_id) for recipe_id in recipe_ids),
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_recipes(sender, instance, created, **kwargs):
+    """Сбрасывает кэш ответов с рецептами переименованного ингредиента."""
+    if created:
+        return
+    recipe_ids = list(
+        RecipeIngredient.objects.filter(ingredient=instance).values_list(
+            'recipe_id', flat=True))
+    if recipe_ids:
+        # Название ингредиента входит в ответ рецепта, поэтому рецепты
+        # считаются измененными для условных запросов.
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            updated_at=timezone.now())
+        recipe_response_cache.bump(
+            LIST_SCOPE,
+            *(recipe_scope(recipe_id) for recipe_id in recipe_ids),
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    """Перестраивает индекс ингредиентов при их изменении."""
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_reference_data(sender, **kwargs):
+    """Перестраивает снимок справочника при изменении тегов и
+    ингредиентов."""
+    reference_data.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, **kwargs):
+    """Переиндексирует рецепт для поиска после его сохранения."""
+    if is_silent_update(update_fields, RECIPE_SILENT_FIELDS):
+        return
+    recipe_search.schedule_update([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def index_recipe_ingredient(sender, instance, **kwargs):
+    """Переиндексирует рецепт при изменении его ингредиентов."""
+    recipe_search.schedule_update([instance.recipe_id])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    """Удаляет рецепт из поискового индекса."""
+    recipe_search.delete([instance.pk])
+
+
+@receiver(post_save, sender=Ingredient)
+def index_ingredient_recipes(sender, instance, created, **kwargs):
+    """Переиндексирует рецепты с переименованным ингредиентом."""
+    if created:
+        return
+    recipe_search.schedule_update(
+        RecipeIngredient.objects.filter(
+            ingredient=instance).values_list('recipe_id', flat=True))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def index_recipe_tags(sender, instance, action, reverse, **kwargs):
+    """Обновляет битовые карты тегов при изменении тегов рецепта."""
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        tag_index.invalidate()
+        return
+    tag_index.schedule_update(
+        instance.pk, instance.tags.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def sync_recipe_tags(sender, instance, update_fields=None, **kwargs):
+    """Запоминает версию битовых карт после сохранения рецепта."""
+    if is_silent_update(update_fields, RECIPE_SILENT_FIELDS):
+        return
+    tag_index.schedule_sync(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe_tags(sender, instance, **kwargs):
+    """Убирает удаленный рецепт из битовых карт тегов."""
+    tag_index.schedule_delete(instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_index(sender, **kwargs):
+    """Перестраивает битовые карты при изменении тегов."""
+    tag_index.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe_postings(sender, instance, update_fields=None, **kwargs):
+    """Обновляет обратный индекс ингредиентов после сохранения рецепта."""
+    if is_silent_update(update_fields, RECIPE_SILENT_FIELDS):
+        return
+    ingredient_postings.schedule_update(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def index_recipe_ingredient_postings(sender, instance, **kwargs):
+    """Обновляет обратный индекс при изменении ингредиентов рецепта."""
+    ingredient_postings.schedule_update(instance.recipe_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe_postings(sender, instance, **kwargs):
+    """Убирает удаленный рецепт из обратного индекса ингредиентов."""
+    ingredient_postings.schedule_delete(instance.pk)
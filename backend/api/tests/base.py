@@ -0,0 +1,130 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from api import images
+from api.indexes import VersionedSnapshot
+from api.membership import membership_cache
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import override_settings
+from recipes import feed
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+from users.models import Subscription
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+METRICS_DIR = tempfile.mkdtemp()
+
+
+class InlineExecutor:
+    """Выполняет задачи фоновой очереди модуля сразу в потоке теста.
+
+    Фоновый поток писал бы в тестовую базу при открытой транзакции
+    теста, а закрытие соединений после задачи закрыло бы соединение
+    теста.
+    """
+
+    def __init__(self, module):
+        self.module = module
+
+    def submit(self, task, *args):
+        with mock.patch.object(self.module, 'connections'):
+            task(*args)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, METRICS_DIR=METRICS_DIR)
+class FoodgramTestCase(APITestCase):
+    """Тест API на небольшом наборе пользователей, тегов и рецептов.
+
+    Кэши процесса сбрасываются перед каждым тестом, поэтому число
+    запросов к базе замеряется с холодного старта.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{number}',
+                email=f'user{number}@example.com',
+                password='password',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for number in range(3)
+        ]
+        cls.user, cls.author, cls.other_author = cls.users
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(6)
+        ]
+        cls.recipes = []
+        for number in range(6):
+            recipe = Recipe.objects.create(
+                author=cls.users[1 + number % 2],
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/images/recipe.png',
+            )
+            recipe.tags.set(cls.tags[:1 + number % 3])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=100)
+                for ingredient in cls.ingredients[number:number + 3]
+            )
+            cls.recipes.append(recipe)
+        Subscription.objects.create(user=cls.user, author=cls.author)
+        Subscription.objects.create(user=cls.user, author=cls.other_author)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        for module in (feed, images):
+            patcher = mock.patch.object(
+                module, 'executor', InlineExecutor(module))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        caches['default'].clear()
+        membership_cache.invalidate()
+        VersionedSnapshot.invalidate_all()
+
+    def client_for(self, user):
+        """Возвращает клиент, аутентифицированный токеном пользователя."""
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def update_recipe(self, recipe, ingredients, **fields):
+        """Изменяет рецепт через API с выполнением отложенных задач."""
+        client = self.client_for(recipe.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(f'/api/recipes/{recipe.pk}/', {
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'tags': [self.tags[0].pk],
+                'ingredients': [
+                    {'id': ingredient.pk, 'amount': 100}
+                    for ingredient in ingredients
+                ],
+                **fields,
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response
@@ -0,0 +1,32 @@
+from api.tests.base import FoodgramTestCase
+from django.utils.http import http_date
+
+
+class ConditionalGetTest(FoodgramTestCase):
+    """Ответы 304 на условные запросы после изменения данных."""
+
+    def test_ingredient_rename_changes_recipe_etag(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        ingredient = self.ingredients[0]
+        ingredient.name = 'Новое название'
+        ingredient.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # Ответ анониму не берется из кэша со старым названием.
+        self.assertIn(
+            'Новое название',
+            [item['name'] for item in response.data['ingredients']])
+
+    def test_deleted_tag_changes_list(self):
+        response = self.client.get('/api/tags/')
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.tags[2].delete()
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH=etag,
+            HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from api.tests.base import FoodgramTestCase
+from recipes import feed
+from django.contrib.auth import get_user_model
+from recipes.models import FeedItem, Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class FeedFanOutTest(FoodgramTestCase):
+    """Рассылка новых рецептов в ленты подписчиков."""
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            author=self.author, name='Новый рецепт', text='Описание',
+            cooking_time=5, image='recipes/images/recipe.png')
+
+    def test_fan_out_after_commit_in_background(self):
+        with mock.patch.object(feed, 'executor') as executor:
+            with self.captureOnCommitCallbacks() as callbacks:
+                recipe = self.create_recipe()
+            # До фиксации транзакции рассылка не выполняется.
+            executor.submit.assert_not_called()
+            for callback in callbacks:
+                callback()
+        self.assertFalse(FeedItem.objects.filter(recipe=recipe).exists())
+        executor.submit.assert_called_once_with(
+            feed.run_task, feed.fan_out, recipe.pk, self.author.pk,
+            recipe.created_at)
+        feed.fan_out(*executor.submit.call_args.args[2:])
+        self.assertEqual(
+            list(FeedItem.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True)),
+            [self.user.pk])
+        # Очередь освобождается фоновой задачей.
+        feed.queue_slots.release()
+
+    def test_full_queue_fans_out_inline(self):
+        with mock.patch.object(feed, 'executor') as executor, \
+                mock.patch.object(feed, 'queue_slots') as queue_slots:
+            queue_slots.acquire.return_value = False
+            with self.assertLogs('recipes.feed', 'WARNING'), \
+                    self.captureOnCommitCallbacks(execute=True):
+                recipe = self.create_recipe()
+        executor.submit.assert_not_called()
+        self.assertTrue(FeedItem.objects.filter(
+            recipe=recipe, user=self.user).exists())
+
+
+class FeedThresholdTest(FoodgramTestCase):
+    """Ленты автора, опустившегося до порога рассылки."""
+
+    def test_refill_after_dropping_to_threshold(self):
+        recipe_ids = {
+            recipe.pk for recipe in self.recipes
+            if recipe.author_id == self.author.pk}
+        with mock.patch.object(
+                feed.constants, 'FEED_FANOUT_MAX_SUBSCRIBERS', 1):
+            # Пока подписчиков больше порога, ленты не заполняются.
+            subscriber = User.objects.create_user(
+                username='subscriber', email='subscriber@example.com',
+                password='password')
+            with self.captureOnCommitCallbacks(execute=True):
+                Subscription.objects.create(
+                    user=subscriber, author=self.author)
+            FeedItem.objects.filter(author=self.author).delete()
+            with self.captureOnCommitCallbacks(execute=True):
+                Subscription.objects.filter(
+                    user=subscriber, author=self.author).delete()
+        self.assertEqual(
+            set(FeedItem.objects.filter(
+                user=self.user, author=self.author).values_list(
+                'recipe_id', flat=True)),
+            recipe_ids)
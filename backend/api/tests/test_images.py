@@ -0,0 +1,123 @@
+import base64
+from io import BytesIO, StringIO
+from unittest import mock
+
+from api import images
+from api.fields import Base64ImageField
+from api.images import derivative_name, process_image
+from api.tests.base import FoodgramTestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from recipes.models import Recipe
+
+from foodgram import constants
+
+
+def make_image(image_format='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', (800, 400), 'red').save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def data_uri(content, mime='png'):
+    return f'data:image/{mime};base64,{base64.b64encode(content).decode()}'
+
+
+class Base64ImageFieldTest(FoodgramTestCase):
+    """Проверка загружаемого изображения на потоке запроса."""
+
+    def test_extension_from_image_format(self):
+        content = make_image('PNG') + b'<script>alert(1)</script>'
+        file = Base64ImageField().to_internal_value(
+            data_uri(content, 'html'))
+        self.assertEqual(file.name, 'temp.png')
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValidationError):
+            Base64ImageField().to_internal_value(
+                data_uri(make_image('BMP'), 'bmp'))
+
+
+class ImageProcessingTest(FoodgramTestCase):
+    """Фоновая проверка и перекодирование изображений рецептов."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[0]
+
+    def save_image(self, content):
+        self.recipe.image.save('recipe.jpg', ContentFile(content))
+        return self.recipe.image.storage, self.recipe.image.name
+
+    def process(self, storage, name):
+        process_image(storage, name, Recipe, self.recipe.pk, 'image')
+
+    def test_valid_image(self):
+        storage, name = self.save_image(make_image())
+        self.process(storage, name)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, name)
+        for variant in constants.IMAGE_VARIANTS:
+            self.assertTrue(storage.exists(derivative_name(name, variant)))
+
+    def test_broken_image_is_rejected(self):
+        # Заголовок PNG без данных изображения.
+        storage, name = self.save_image(b'\x89PNG\r\n\x1a\n' + b'\0' * 64)
+        with self.assertLogs('api.images', 'WARNING'):
+            self.process(storage, name)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+        self.assertFalse(storage.exists(name))
+
+    def test_replaced_image_is_kept(self):
+        storage, name = self.save_image(b'broken')
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image='recipes/other.png')
+        with self.assertLogs('api.images', 'WARNING'):
+            self.process(storage, name)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, 'recipes/other.png')
+
+    def test_replaced_image_derivatives_are_deleted(self):
+        storage, name = self.save_image(make_image())
+        self.process(storage, name)
+        with mock.patch('api.images.submit'):
+            self.update_recipe(
+                self.recipe, self.ingredients[:1],
+                image=data_uri(make_image('PNG')))
+        self.assertFalse(storage.exists(name))
+        for variant in constants.IMAGE_VARIANTS:
+            self.assertFalse(storage.exists(derivative_name(name, variant)))
+
+    def test_full_queue_processes_inline(self):
+        storage, name = self.save_image(b'broken')
+        with mock.patch.object(images, 'queue_slots') as queue_slots, \
+                mock.patch.object(images, 'executor') as executor, \
+                self.assertLogs('api.images', 'WARNING'):
+            queue_slots.acquire.return_value = False
+            images.submit(
+                process_image, storage, name, Recipe, self.recipe.pk, 'image')
+        executor.submit.assert_not_called()
+        self.assertFalse(storage.exists(name))
+
+
+class GenerateImageDerivativesTest(FoodgramTestCase):
+    """Команда создания уменьшенных копий изображений."""
+
+    def test_lists_each_directory_once(self):
+        for recipe in self.recipes[:2]:
+            recipe.image.save('recipe.jpg', ContentFile(make_image()))
+        call_command('generate_image_derivatives', stdout=StringIO())
+        with mock.patch.object(
+                default_storage, 'listdir',
+                wraps=default_storage.listdir) as listdir, \
+                mock.patch.object(default_storage, 'exists') as exists:
+            out = StringIO()
+            call_command('generate_image_derivatives', stdout=out)
+        exists.assert_not_called()
+        # Каталоги загруженных файлов и изображений из setUpTestData.
+        self.assertEqual(listdir.call_count, 2)
+        self.assertIn('пропущено: 2', out.getvalue())
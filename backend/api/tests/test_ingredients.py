@@ -0,0 +1,47 @@
+from api.tests.base import FoodgramTestCase
+from recipes.models import Ingredient
+
+
+class IngredientListTest(FoodgramTestCase):
+    """Список ингредиентов из индекса в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Название раньше остальных по алфавиту, но с наибольшим ID.
+        cls.apricot = Ingredient.objects.create(
+            name='Абрикос', measurement_unit='шт')
+
+    def test_without_name_ordered_by_id(self):
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [ingredient['id'] for ingredient in response.data],
+            list(Ingredient.objects.order_by('id').values_list(
+                'id', flat=True)))
+
+    def test_empty_name_ordered_by_id(self):
+        response = self.client.get('/api/ingredients/?name=&limit=2')
+        self.assertEqual(
+            [ingredient['id'] for ingredient in response.data],
+            [ingredient.pk for ingredient in self.ingredients[:2]])
+
+    def test_name_ordered_by_name(self):
+        response = self.client.get('/api/ingredients/?name=а')
+        self.assertEqual(response.data[0]['id'], self.apricot.pk)
+
+    def test_invalid_limit(self):
+        for limit in ('abc', '-1', ''):
+            with self.subTest(limit=limit):
+                response = self.client.get(
+                    '/api/ingredients/', {'limit': limit})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.data['limit'],
+                    'Укажите неотрицательное целое число.')
+
+    def test_invalid_limit_not_modified(self):
+        etag = self.client.get('/api/ingredients/')['ETag']
+        response = self.client.get(
+            '/api/ingredients/?limit=abc', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,63 @@
+from unittest import mock
+
+from api.facets import tag_index
+from api.matching import ingredient_postings
+from api.tests.base import FoodgramTestCase
+from recipes.models import RecipeIngredient
+
+
+class RecipesByIngredientsTest(FoodgramTestCase):
+    """Подбор рецептов по имеющимся ингредиентам."""
+
+    def match(self, ingredients):
+        response = self.client.get('/api/recipes/by_ingredients/', {
+            'ingredients': [ingredient.pk for ingredient in ingredients]})
+        self.assertEqual(response.status_code, 200)
+        return [
+            (recipe['id'], recipe['matched_ingredients'],
+             recipe['missing_ingredients'])
+            for recipe in response.data['results']
+        ]
+
+    def test_queries(self):
+        # Построение индекса: версия и строки ингредиентов рецептов.
+        with self.assertNumQueries(6):
+            self.match(self.ingredients[:1])
+        # Рецепты страницы, теги и ингредиенты.
+        with self.assertNumQueries(3):
+            self.match(self.ingredients[:1])
+
+    def test_ranking(self):
+        self.assertEqual(self.match(self.ingredients[:3])[0],
+                         (self.recipes[0].pk, 3, 0))
+
+    def test_index_follows_updates(self):
+        self.match(self.ingredients[:1])
+        recipe = self.recipes[5]
+        self.update_recipe(recipe, self.ingredients[:1])
+        self.assertIn((recipe.pk, 1, 0), self.match(self.ingredients[:1]))
+        self.update_recipe(recipe, self.ingredients[2:4])
+        self.assertNotIn(
+            recipe.pk, [item[0] for item in self.match(self.ingredients[:1])])
+
+    def test_own_update_does_not_rebuild(self):
+        self.match(self.ingredients[:1])
+        for index in (ingredient_postings, tag_index):
+            index.get_snapshot()
+        self.update_recipe(self.recipes[5], self.ingredients[:1])
+        self.update_recipe(self.recipes[5], self.ingredients[:2], name='Имя')
+        for index in (ingredient_postings, tag_index):
+            with self.subTest(index=type(index).__name__), \
+                    mock.patch.object(index, 'build') as build:
+                # Проверка версии после интервала.
+                index._checked_at = 0
+                index.get_snapshot()
+                build.assert_not_called()
+
+    def test_foreign_update_rebuilds(self):
+        self.match(self.ingredients[:1])
+        RecipeIngredient.objects.filter(recipe=self.recipes[5]).delete()
+        ingredient_postings._checked_at = 0
+        self.assertNotIn(
+            self.recipes[5].pk,
+            [item[0] for item in self.match(self.ingredients[5:])])
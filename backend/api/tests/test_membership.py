@@ -0,0 +1,49 @@
+from api.tests.base import FoodgramTestCase
+from recipes.models import Favorite, ShoppingCart
+
+
+class MembershipCacheTest(FoodgramTestCase):
+    """Отметки пользователя, измененные в другом процессе.
+
+    Записи создаются без запросов к API, поэтому кэш текущего процесса
+    не сбрасывается, как в процессе, не обрабатывавшем изменение.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user_client = self.client_for(self.user)
+
+    def get_ids(self, **params):
+        response = self.user_client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id'] for recipe in response.data['results']}
+
+    def test_favorited_filter(self):
+        self.assertEqual(
+            self.get_ids(is_favorited=1), {self.recipes[0].pk})
+        Favorite.objects.create(user=self.user, recipe=self.recipes[2])
+        self.assertEqual(
+            self.get_ids(is_favorited=1),
+            {self.recipes[0].pk, self.recipes[2].pk})
+
+    def test_shopping_cart_filter(self):
+        self.assertEqual(
+            self.get_ids(is_in_shopping_cart=1), {self.recipes[1].pk})
+        ShoppingCart.objects.filter(user=self.user).delete()
+        self.assertEqual(self.get_ids(is_in_shopping_cart=1), set())
+
+    def test_etag(self):
+        url = f'/api/recipes/{self.recipes[2].pk}/'
+        response = self.user_client.get(url)
+        self.assertFalse(response.data['is_favorited'])
+        etag = response['ETag']
+        Favorite.objects.create(user=self.user, recipe=self.recipes[2])
+        response = self.user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_cached_between_requests(self):
+        self.get_ids()
+        # Токен с пользователем, количество, рецепты, теги и ингредиенты.
+        with self.assertNumQueries(5):
+            self.get_ids()
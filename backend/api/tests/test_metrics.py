@@ -0,0 +1,62 @@
+import json
+import os
+from pathlib import Path
+
+from api.metrics import metrics_store
+from api.tests.base import FoodgramTestCase
+from django.conf import settings
+
+# PID больше максимально возможного в Linux: процесса с ним нет.
+DEAD_PID = 999999999
+
+
+class MetricsTest(FoodgramTestCase):
+    """Метрики запросов в формате Prometheus."""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = Path(settings.METRICS_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in self.directory.glob('*.json'):
+            path.unlink()
+        metrics_store._start()
+        self.user.is_staff = True
+        self.user.save()
+
+    def write_file(self, name):
+        """Записывает файл метрик с одним запросом к списку тегов."""
+        path = self.directory / name
+        path.write_text(json.dumps({
+            'http_requests_total': [[['tags-list', 'GET', '200'], 1]]}))
+        return path
+
+    def render(self):
+        response = self.client_for(self.user).get('/api/_metrics')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_dead_process_files(self):
+        dead = self.write_file(f'{DEAD_PID}-1.json')
+        # Файл прежнего процесса с тем же PID, что у текущего.
+        reused = self.write_file(f'{os.getpid()}.json')
+        self.assertNotIn('route="tags-list"', self.render())
+        self.assertFalse(dead.exists())
+        self.assertFalse(reused.exists())
+
+    def test_unknown_method(self):
+        response = self.client.generic('FOO', '/api/tags/')
+        self.assertEqual(response.status_code, 405)
+        metrics = self.render()
+        self.assertIn('method="other",status="405"', metrics)
+        self.assertNotIn('FOO', metrics)
+
+    def test_response_cache_counters(self):
+        self.client.get('/api/recipes/')
+        self.client.get('/api/recipes/')
+        metrics = self.render()
+        self.assertIn(
+            'foodgram_response_cache_requests_total'
+            '{cache="recipes",result="miss"} 1', metrics)
+        self.assertIn(
+            'foodgram_response_cache_requests_total'
+            '{cache="recipes",result="hit"} 1', metrics)
@@ -0,0 +1,126 @@
+from api.tests.base import FoodgramTestCase
+from recipes.models import Recipe, RecipeIngredient
+
+
+class RecipeQueriesTest(FoodgramTestCase):
+    """Число запросов к базе на чтение рецептов."""
+
+    def test_list_anonymous(self):
+        # Количество, рецепты, теги и ингредиенты.
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(self.recipes))
+        # Повторный ответ анониму отдается из кэша.
+        with self.assertNumQueries(0):
+            self.client.get('/api/recipes/')
+
+    def test_list_authenticated(self):
+        client = self.client_for(self.user)
+        # Токен, выдача и множества избранного, корзины и подписок.
+        with self.assertNumQueries(8):
+            response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(5):
+            client.get('/api/recipes/')
+
+    def test_list_does_not_depend_on_page_size(self):
+        author = self.author
+        for number in range(10):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Еще рецепт {number}', text='Описание',
+                cooking_time=5, image='recipes/images/recipe.png')
+            recipe.tags.set(self.tags)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.ingredients[0], amount=1)
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/recipes/?limit=15')
+        self.assertEqual(len(response.data['results']), 15)
+
+    def test_cursor_list(self):
+        # Без подсчета общего количества.
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/recipes/?limit=2&cursor=')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_detail_anonymous(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        # Версия рецепта для ETag, рецепт, теги и ингредиенты.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Из кэша читается только версия рецепта.
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_detail_authenticated(self):
+        client = self.client_for(self.user)
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        with self.assertNumQueries(8):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        with self.assertNumQueries(5):
+            client.get(url)
+
+
+class SubscriptionQueriesTest(FoodgramTestCase):
+    """Число запросов к базе на чтение подписок."""
+
+    def test_subscriptions(self):
+        client = self.client_for(self.user)
+        # Токен, количество, авторы и их рецепты одним запросом.
+        with self.assertNumQueries(4):
+            response = client.get('/api/users/subscriptions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        for author in response.data['results']:
+            self.assertEqual(
+                len(author['recipes']), author['recipes_count'])
+
+    def test_subscriptions_recipes_limit(self):
+        client = self.client_for(self.user)
+        with self.assertNumQueries(4):
+            response = client.get(
+                '/api/users/subscriptions/?recipes_limit=1')
+        for author in response.data['results']:
+            self.assertEqual(len(author['recipes']), 1)
+
+
+class RecipeUpdateQueriesTest(FoodgramTestCase):
+    """Число запросов к базе на изменение рецепта вместе с отложенными
+    задачами переиндексации."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[0]
+        self.update_recipe(self.recipe, self.ingredients)
+
+    def test_removed_ingredients(self):
+        # Переиндексация и пересчет похожих не зависят от числа строк.
+        with self.assertNumQueries(25):
+            self.update_recipe(self.recipe, self.ingredients[:1])
+
+    def test_removed_ingredient(self):
+        with self.assertNumQueries(25):
+            self.update_recipe(self.recipe, self.ingredients[:5])
+
+    def test_title_only(self):
+        with self.assertNumQueries(16):
+            self.update_recipe(self.recipe, self.ingredients, name='Новое')
+
+
+class FeedQueriesTest(FoodgramTestCase):
+    """Число запросов к базе на чтение ленты подписок."""
+
+    def test_feed(self):
+        client = self.client_for(self.user)
+        client.get('/api/recipes/feed/')
+        # Токен, авторы без рассылки, страница ленты и рецепты с тегами и
+        # ингредиентами; множества отметок уже в кэше.
+        for limit in (2, 6):
+            with self.subTest(limit=limit), self.assertNumQueries(6):
+                response = client.get(f'/api/recipes/feed/?limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), limit)
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from api.tests.base import FoodgramTestCase
+from django.utils import timezone
+from recipes.models import Favorite, ShoppingCart
+from recipes.scores import update_scores
+
+
+class RecipeScoresTest(FoodgramTestCase):
+    """Популярность и рейтинг рецептов в трендах."""
+
+    def setUp(self):
+        super().setUp()
+        update_scores()
+        self.recipe = self.recipes[2]
+
+    def get_scores(self):
+        self.recipe.refresh_from_db()
+        return self.recipe.popularity, self.recipe.trending_score
+
+    def test_remove_recent_event(self):
+        old = timezone.now() - timedelta(days=3)
+        Favorite.objects.create(
+            user=self.author, recipe=self.recipe, created_at=old)
+        before = self.get_scores()
+        response = self.client_for(self.user).post(
+            f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        response = self.client_for(self.user).delete(
+            f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        popularity, trending_score = self.get_scores()
+        self.assertEqual(popularity, before[0])
+        # Вычитается вклад недавнего события, а не ноль и не больше.
+        self.assertGreater(trending_score, 0)
+        self.assertAlmostEqual(trending_score, before[1])
+
+    def test_remove_old_event(self):
+        ShoppingCart.objects.create(user=self.other_author, recipe=self.recipe)
+        _, recent_score = self.get_scores()
+        item = ShoppingCart.objects.create(
+            user=self.author, recipe=self.recipe,
+            created_at=timezone.now() - timedelta(days=3))
+        self.assertGreater(self.get_scores()[1], recent_score)
+        item.delete()
+        # Остается вклад недавнего события.
+        self.assertAlmostEqual(self.get_scores()[1], recent_score)
+
+    def test_remove_event_without_time(self):
+        item = Favorite.objects.create(user=self.author, recipe=self.recipe)
+        Favorite.objects.filter(pk=item.pk).update(created_at=None)
+        popularity, trending_score = self.get_scores()
+        Favorite.objects.get(pk=item.pk).delete()
+        self.assertEqual(
+            self.get_scores(), (popularity - 2, trending_score))
+
+    def test_trending_ordering(self):
+        Favorite.objects.create(user=self.author, recipe=self.recipe)
+        response = self.client.get('/api/recipes/', {'ordering': 'trending'})
+        self.assertEqual(response.data['results'][0]['id'], self.recipe.pk)
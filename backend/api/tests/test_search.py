@@ -0,0 +1,69 @@
+from api.search import normalize, recipe_search
+from api.tests.base import FoodgramTestCase
+from recipes.models import Recipe
+
+
+class RecipeSearchTest(FoodgramTestCase):
+    """Поиск рецептов по кириллическим запросам с «ё» и «й»."""
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(
+                author=self.author, name='Зелёный чай',
+                text='Заварить и настоять', cooking_time=5,
+                image='recipes/images/recipe.png')
+            # Рецепт другого автора выше по рангу: «чай» в названии дважды.
+            self.other_recipe = Recipe.objects.create(
+                author=self.other_author, name='Чай и чайный гриб',
+                text='Заварить', cooking_time=5,
+                image='recipes/images/recipe.png')
+
+    def search(self, query):
+        response = self.client.get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_normalize(self):
+        self.assertEqual(normalize('Зелёный ЧАЙ'), 'зеленый чай')
+        self.assertEqual(normalize('Crème brûlée'), 'creme brulee')
+
+    def test_queries_with_short_i_and_yo(self):
+        for query in ('ЗЕЛЕНЫЙ', 'зеленый', 'зелёный', 'зелёный чай',
+                      'зел'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [self.recipe.pk])
+
+    def test_query_with_short_i_only(self):
+        self.assertEqual(
+            self.search('чай'), [self.other_recipe.pk, self.recipe.pk])
+
+    def test_memory_index(self):
+        for query in ('зеленый чай', 'зеленый', 'зелёный'):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    recipe_search.memory.search(query, limit=10),
+                    [self.recipe.pk])
+
+    def test_limit_applies_after_filters(self):
+        queryset = Recipe.objects.filter(author=self.author)
+        for backend in (recipe_search.fts, recipe_search.memory):
+            with self.subTest(backend=type(backend).__name__):
+                backend_ids = backend.search('чай', limit=1)
+                self.assertEqual(backend_ids, [self.other_recipe.pk])
+                self.assertEqual(
+                    backend.filter(queryset, 'чай', limit=1),
+                    [self.recipe.pk])
+
+    def test_search_with_author_filter(self):
+        response = self.client.get(
+            '/api/recipes/', {'search': 'чай', 'author': self.author.pk})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipe.pk])
+
+    def test_search_rejects_cursor(self):
+        response = self.client.get(
+            '/api/recipes/', {'search': 'чай', 'cursor': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
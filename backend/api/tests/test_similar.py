@@ -0,0 +1,44 @@
+from api.tests.base import FoodgramTestCase
+from recipes.models import SimilarRecipe
+from recipes.similarity import build_similar_recipes
+
+
+class SimilarRecipesTest(FoodgramTestCase):
+    """Пересчет похожих рецептов при изменении ингредиентов."""
+
+    def setUp(self):
+        super().setUp()
+        build_similar_recipes()
+        self.recipe = self.recipes[3]
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def get_similar(self):
+        return set(SimilarRecipe.objects.filter(
+            recipe=self.recipe).values_list('similar_id', 'score'))
+
+    def patch_ingredients(self, ingredients):
+        self.update_recipe(self.recipe, ingredients)
+
+    def assert_rebuilt(self):
+        """Проверяет, что список совпадает с построенным заново."""
+        similar = self.get_similar()
+        build_similar_recipes()
+        self.assertEqual(similar, self.get_similar())
+
+    def test_added_ingredients(self):
+        before = self.get_similar()
+        self.patch_ingredients(self.ingredients)
+        self.assertNotEqual(self.get_similar(), before)
+        self.assert_rebuilt()
+
+    def test_removed_ingredients(self):
+        self.patch_ingredients(self.ingredients[4:6])
+        self.assert_rebuilt()
+
+    def test_similar_endpoint(self):
+        self.patch_ingredients(self.recipes[0].ingredients.all())
+        with self.assertNumQueries(1):
+            response = self.client.get(f'{self.url}similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['id'], self.recipes[0].pk)
+        self.assertEqual(response.data[0]['similarity'], 1.0)
@@ -0,0 +1,25 @@
+from api.tests.base import FoodgramTestCase
+from users.models import Subscription
+
+
+class SubscribeTest(FoodgramTestCase):
+    """Подписка на автора с параметрами ответа."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.other_author)
+        self.url = f'/api/users/{self.author.pk}/subscribe/'
+
+    def is_subscribed(self):
+        return Subscription.objects.filter(
+            user=self.other_author, author=self.author).exists()
+
+    def test_invalid_recipes_limit_does_not_subscribe(self):
+        response = self.client.post(f'{self.url}?recipes_limit=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('recipes_limit', response.data)
+        self.assertFalse(self.is_subscribed())
+        response = self.client.post(f'{self.url}?recipes_limit=1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['recipes']), 1)
+        self.assertTrue(self.is_subscribed())
@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.test import TestCase
+from recipes.transactions import on_commit_batch
+
+
+class OnCommitBatchTest(TestCase):
+    """Отложенные обработчики, вызываемые один раз на транзакцию."""
+
+    def test_one_call_per_transaction(self):
+        calls = []
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            on_commit_batch(calls.append, [3, 1])
+            on_commit_batch(calls.append, [1, 2])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(calls, [[1, 2, 3]])
+
+    def test_new_batch_after_commit(self):
+        calls = []
+        for recipe_id in (1, 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                on_commit_batch(calls.append, [recipe_id])
+        self.assertEqual(calls, [[1], [2]])
+
+    def test_rolled_back_savepoint(self):
+        calls = []
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    on_commit_batch(calls.append, [1])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            on_commit_batch(calls.append, [2])
+        self.assertEqual(calls, [[2]])
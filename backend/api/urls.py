@@ -1,5 +1,5 @@
-from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet)
+from api.views import (CustomUserViewSet, IngredientViewSet, MetricsView,
+                       RecipeViewSet, ReferenceDataViewSet, TagViewSet)
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
@@ -15,10 +15,14 @@ router_v1.register('tags', TagViewSet, basename='tags')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredient')
 # Регистрация маршрутов для рецептов
 router_v1.register('recipes', RecipeViewSet, basename='recipe')
+# Регистрация маршрутов для снимка справочника тегов и ингредиентов
+router_v1.register('reference', ReferenceDataViewSet, basename='reference')
 
 # Определение конечных точек версии 1 API
 v1_endpoints = [
     path('', include(router_v1.urls)),  # Включение маршрутов из маршрутизатора
+    # Метрики запросов в формате Prometheus для персонала
+    path('_metrics', MetricsView.as_view(), name='metrics'),
     # Включение маршрутов аутентификации Djoser
     path('auth/', include('djoser.urls')),
     # Включение маршрутов для токенов аутентификации Djoser
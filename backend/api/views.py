@@ -1,33 +1,66 @@
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from api.cache import (GLOBAL_SCOPE, LIST_SCOPE, recipe_response_cache,
+                       recipe_scope)
+from api.facets import bitmap_from_ids, tag_index
 from api.filters import RecipeFilter
-from api.mixins import AddDelMixin
-from api.pagination import CustomPagination
+from api.images import delete_derivatives
+from api.indexes import ingredient_index
+from api.matching import ingredient_postings
+from api.membership import membership_cache
+from api.metrics import metrics_store
+from api.mixins import (AddDelMixin, ConditionalGetMixin,
+                        CursorPaginationMixin)
+from api.pagination import (RECIPE_ORDERINGS, CustomPagination,
+                            FeedKeysetPagination, RecipeKeysetPagination,
+                            UserKeysetPagination)
 from api.permissions import IsAuthorOrReadOnly
+from api.reference import reference_data
+from api.renderers import (CSVRenderer, PlainTextRenderer,
+                           PrometheusRenderer)
+from api.search import recipe_search
 from api.serializers import (CustomUserCreateSerializer,
                              CustomUserPasswordSerializer,
                              CustomUserSerializer, IngredientsSerializer,
-                             RecipeSerializer, TagSerializer,
-                             UserSubscriptionSerializer)
+                             RecipeDemoSerializer, RecipeSerializer,
+                             TagSerializer, UserSubscriptionSerializer)
+from api.shopping_list import STREAMS, get_shopping_list
 from django.contrib.auth import get_user_model
-from django.db.models import Exists, OuterRef, Sum
-from django.http import HttpResponse
+from django.core.exceptions import ValidationError
+from django.db.models import F, Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from rest_framework import status, viewsets
+from recipes.feed import pull_author_ids
+from recipes.models import (Favorite, FeedItem, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, SimilarRecipe,
+                            Tag)
+from rest_framework import serializers, status, views, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import _positive_int
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from users.models import Subscription
 
+from foodgram import constants
+
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(CursorPaginationMixin, UserViewSet):
     """ViewSet для управления учетными записями пользователей."""
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
+    cursor_pagination_class = UserKeysetPagination
 
     def get_permissions(self):
         """Определяет разрешения для действий."""
@@ -71,6 +104,7 @@ class CustomUserViewSet(UserViewSet):
 
         if request.method == 'DELETE':
             if user.avatar:
+                delete_derivatives(user.avatar)
                 user.avatar.delete(save=True)
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response(
@@ -100,20 +134,22 @@ class CustomUserViewSet(UserViewSet):
                 user=user, author=author)
             if subscription.exists():
                 subscription.delete()
+                membership_cache.invalidate(user.id)
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response(
                 'Вы не подписаны на пользователя',
                 status=status.HTTP_400_BAD_REQUEST)
 
+        # Параметры ответа проверяются до записи подписки.
+        recipes_limit = self.get_recipes_limit(request)
         _, created = Subscription.objects.get_or_create(
             user=user, author=author)
         if created:
-            recipes_limit = request.query_params.get('recipes_limit')
+            membership_cache.invalidate(user.id)
             serializer = UserSubscriptionSerializer(
                 author,
-                context={
-                    'request': request,
-                    'recipes_limit': recipes_limit})
+                context=self.get_subscription_context(
+                    request, [author], recipes_limit))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(
             'Вы уже подписаны',
@@ -124,22 +160,49 @@ class CustomUserViewSet(UserViewSet):
     def subscriptions(self, request):
         """Получает список подписок для аутентифицированного пользователя."""
         user = request.user
-        queryset = User.objects.filter(subscribed_to__user=user)
-        recipes_limit = request.query_params.get('recipes_limit')
+        recipes_limit = self.get_recipes_limit(request)
+        queryset = User.objects.filter(
+            subscribed_to__user=user
+        ).order_by('username')
 
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = UserSubscriptionSerializer(
-                page, many=True, context={
-                    'request': request, 'recipes_limit': recipes_limit})
+                page, many=True,
+                context=self.get_subscription_context(
+                    request, page, recipes_limit))
             return self.get_paginated_response(serializer.data)
+        authors = list(queryset)
         serializer = UserSubscriptionSerializer(
-            queryset, many=True, context={
-                'request': request, 'recipes_limit': recipes_limit})
+            authors, many=True,
+            context=self.get_subscription_context(
+                request, authors, recipes_limit))
         return Response(serializer.data)
 
+    def get_subscription_context(self, request, authors, recipes_limit):
+        """Загружает рецепты авторов одним запросом для сериализатора."""
+        recipes_by_author = defaultdict(list)
+        recipes = Recipe.objects.latest_by_author(
+            [author.id for author in authors],
+            limit=recipes_limit,
+        ).only('id', 'name', 'image', 'cooking_time', 'author_id')
+        for recipe in recipes:
+            recipes_by_author[recipe.author_id].append(recipe)
+        return {'request': request, 'recipes_by_author': recipes_by_author}
+
+    def get_recipes_limit(self, request):
+        """Возвращает лимит рецептов на автора из параметров запроса."""
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            return _positive_int(recipes_limit)
+        except ValueError:
+            raise serializers.ValidationError(
+                {'recipes_limit': 'Укажите неотрицательное целое число.'})
+
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для получения тегов."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -147,7 +210,8 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None  # Без пагинации
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """ViewSet для получения ингредиентов."""
     queryset = Ingredient.objects.all().order_by('id')
     serializer_class = IngredientsSerializer
@@ -162,15 +226,88 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
 
         return queryset.filter(name__istartswith=name) if name else queryset
 
+    def list(self, request, *args, **kwargs):
+        """Ищет ингредиенты по индексу в памяти, минуя базу данных."""
+        # Лимит проверяется до сравнения валидаторов, чтобы на ошибку в
+        # параметре не пришел ответ 304.
+        limit = self.get_limit(request)
+        return self.conditional_response(
+            request,
+            lambda: Response(ingredient_index.search(
+                request.query_params.get('name', ''), limit=limit)),
+            *args, **kwargs)
+
+    def get_limit(self, request):
+        """Возвращает ограничение количества результатов из запроса."""
+        limit = request.query_params.get('limit')
+        if limit is None:
+            return None
+        try:
+            return _positive_int(limit)
+        except ValueError:
+            raise serializers.ValidationError(
+                {'limit': 'Укажите неотрицательное целое число.'})
+
+    def get_validators(self, request, *args, **kwargs):
+        """Возвращает валидаторы списка по версии индекса."""
+        if self.action != 'list':
+            return super().get_validators(request, *args, **kwargs)
+        count, updated_at = ingredient_index.get_snapshot().version
+        if updated_at is None:
+            return None
+        return f'ingredient-{count}-{updated_at.timestamp()}', None
+
+
+class ReferenceDataViewSet(viewsets.ViewSet):
+    """ViewSet для снимка справочника тегов и ингредиентов.
+
+    Список возвращает текущую версию снимка, а сам снимок отдается по
+    адресу с версией и кэшируется клиентами без повторной проверки.
+    """
+    permission_classes = [AllowAny]  # Доступ для всех
+    authentication_classes = []  # Ответ не зависит от пользователя
+    lookup_value_regex = '[0-9a-f]+'
+
+    def list(self, request):
+        """Возвращает текущую версию снимка и ссылку на него."""
+        snapshot = reference_data.get_snapshot()
+        etag = quote_etag(snapshot.version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response({
+                'version': snapshot.version,
+                'url': request.build_absolute_uri(reverse(
+                    'api:reference-detail', args=[snapshot.version])),
+            })
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def retrieve(self, request, pk=None):
+        """Отдает снимок указанной версии или перенаправляет на текущий."""
+        snapshot = reference_data.get_snapshot()
+        if pk != snapshot.version:
+            response = redirect(
+                'api:reference-detail', pk=snapshot.version)
+            response['Cache-Control'] = 'no-cache'
+            return response
+        response = HttpResponse(
+            snapshot.content, content_type='application/json; charset=utf-8')
+        response['ETag'] = quote_etag(snapshot.version)
+        response['Cache-Control'] = (
+            f'public, max-age={constants.REFERENCE_MAX_AGE}, immutable')
+        return response
+
 
-class RecipeViewSet(viewsets.ModelViewSet, AddDelMixin):
+class RecipeViewSet(ConditionalGetMixin, CursorPaginationMixin,
+                    viewsets.ModelViewSet, AddDelMixin):
     """ViewSet для управления рецептами."""
     queryset = Recipe.objects.all().order_by('-created_at')
     serializer_class = RecipeSerializer
     pagination_class = CustomPagination
+    cursor_pagination_class = RecipeKeysetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
-    search_fields = ['tags__slug']  # Поиск по тегам
 
     def get_permissions(self):
         """Определяет разрешения для действий."""
@@ -181,27 +318,222 @@ class RecipeViewSet(viewsets.ModelViewSet, AddDelMixin):
             'destroy',
             'favorite',
             'download_shopping_cart',
+            'feed',
                 'shopping_cart']:
             # Только аутентифицированным и авторам
             return [IsAuthenticated(), IsAuthorOrReadOnly()]
         return [AllowAny()]  # Разрешить всем
 
+    def get_related_queryset(self):
+        """Возвращает рецепты с подгрузкой автора, тегов и ингредиентов."""
+        return super().get_queryset().select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient')),
+        )
+
     def get_queryset(self):
-        """Возвращает рецепты с возможной фильтрацией по тегам и автору."""
-        queryset = super().get_queryset()
+        """Возвращает рецепты с фильтрацией по тегам и автору и сортировкой
+        из параметра ordering."""
+        queryset = self.get_related_queryset()
         tags = self.request.query_params.getlist('tags')
         author = self.request.query_params.get('author')
-        user = self.request.user
-        if user.is_authenticated:
-            queryset = queryset.annotate(
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        user=user, recipe=OuterRef('pk'))))
         if tags:
             queryset = queryset.filter(tags__slug__in=tags).distinct()
         if author:
             queryset = queryset.filter(author__id=author)
-        return queryset.order_by('id')
+        return queryset.order_by(*RECIPE_ORDERINGS.get(
+            self.request.query_params.get('ordering'), ('id',)))
+
+    def get_serializer_context(self):
+        """Добавляет в контекст вариант изображения для списка."""
+        context = super().get_serializer_context()
+        if self.action in ('list', 'by_ingredients', 'feed'):
+            context['image_variant'] = 'medium'
+        return context
+
+    def list(self, request, *args, **kwargs):
+        """Возвращает список рецептов, для анонимов — из кэша."""
+        return recipe_response_cache.get_response(
+            request, 'list', [GLOBAL_SCOPE, LIST_SCOPE],
+            lambda: self.list_with_facets(request, *args, **kwargs))
+
+    def list_with_facets(self, request, *args, **kwargs):
+        """Добавляет к списку количество рецептов по тегам, если в
+        запросе передан параметр facets."""
+        response = super().list(request, *args, **kwargs)
+        if (response.status_code == status.HTTP_200_OK
+                and request.query_params.get('facets', '').lower()
+                in constants.FACETS_TRUE_VALUES):
+            response.data['facets'] = {'tags': self.get_tag_facets(request)}
+        return response
+
+    def get_tag_facets(self, request):
+        """Считает рецепты по тегам пересечением битовых карт фильтров."""
+        filterset = self.filterset_class(
+            request.query_params, queryset=Recipe.objects.none(),
+            request=request)
+        filterset.is_valid()
+        params = filterset.form.cleaned_data
+        bitmaps = []
+        author = request.query_params.get('author')
+        if author:
+            bitmaps.append(bitmap_from_ids(
+                Recipe.objects.filter(
+                    author__id=author).values_list('id', flat=True)))
+        if request.user.is_authenticated:
+            membership = membership_cache.get(request.user)
+            if params.get('is_favorited'):
+                bitmaps.append(bitmap_from_ids(membership.favorites))
+            if params.get('is_in_shopping_cart'):
+                bitmaps.append(bitmap_from_ids(membership.shopping_cart))
+        if params.get('search'):
+            bitmaps.append(bitmap_from_ids(
+                recipe_search.search(params['search'], limit=None)))
+        return tag_index.facets(
+            reduce(operator.and_, bitmaps) if bitmaps else None,
+            request.query_params.getlist('tags'))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Возвращает рецепт, для анонимов — из кэша."""
+        pk = kwargs[self.lookup_field]
+        return self.conditional_response(
+            request,
+            lambda: recipe_response_cache.get_response(
+                request, f'detail:{pk}', [GLOBAL_SCOPE, recipe_scope(pk)],
+                lambda: super(ConditionalGetMixin, self).retrieve(
+                    request, *args, **kwargs)),
+            *args, **kwargs)
+
+    def get_validators(self, request, *args, **kwargs):
+        """Возвращает валидаторы рецепта с учетом отметок пользователя."""
+        if self.action != 'retrieve':
+            return None
+        pk = kwargs[self.lookup_field]
+        try:
+            recipe = Recipe.objects.filter(pk=pk).values(
+                'updated_at', 'author_id').first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if recipe is None:
+            return None
+        etag = f'recipe-{pk}-{recipe["updated_at"].timestamp()}'
+        if not request.user.is_authenticated:
+            return etag, recipe['updated_at']
+        # Отметки пользователя не меняют updated_at, поэтому для него
+        # ответ проверяется только по ETag.
+        membership = membership_cache.get(request.user)
+        etag += '-{:d}{:d}{:d}'.format(
+            int(pk) in membership.favorites,
+            int(pk) in membership.shopping_cart,
+            recipe['author_id'] in membership.subscriptions,
+        )
+        return etag, None
+
+    @action(detail=False, methods=['GET'])
+    def feed(self, request):
+        """Возвращает ленту рецептов авторов из подписок от новых к старым.
+
+        Рецепты большинства авторов читаются из записей ленты, а рецепты
+        авторов с большим числом подписчиков — из их рецептов.
+        """
+        pulled = pull_author_ids(request.user)
+        querysets = [
+            FeedItem.objects.filter(user=request.user).exclude(
+                author_id__in=pulled).only('created_at', 'recipe_id'),
+        ]
+        if pulled:
+            querysets.append(Recipe.objects.filter(
+                author_id__in=pulled).annotate(
+                recipe_id=F('id')).only('created_at'))
+        paginator = FeedKeysetPagination()
+        page = paginator.paginate_querysets(querysets, request, view=self)
+        recipes = self.get_related_queryset().in_bulk(
+            [item.recipe_id for item in page])
+        serializer = self.get_serializer(
+            [recipes[item.recipe_id] for item in page
+             if item.recipe_id in recipes],
+            many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='by_ingredients')
+    def by_ingredients(self, request):
+        """Подбирает рецепты по имеющимся ингредиентам.
+
+        Первыми идут рецепты, для которых не хватает меньше всего
+        ингредиентов; в каждом рецепте указано число найденных
+        (matched_ingredients) и недостающих (missing_ingredients).
+        """
+        matches = ingredient_postings.match(
+            self.get_ingredient_ids(request),
+            max_missing=self.get_max_missing(request))
+        paginator = CustomPagination()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        recipes = self.get_related_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page])
+        data = []
+        for recipe_id, matched, missing in page:
+            # Рецепт мог быть удален после построения снимка индекса.
+            if recipe_id not in recipes:
+                continue
+            item = self.get_serializer(recipes[recipe_id]).data
+            item['matched_ingredients'] = matched
+            item['missing_ingredients'] = missing
+            data.append(item)
+        return paginator.get_paginated_response(data)
+
+    def get_ingredient_ids(self, request):
+        """Возвращает ID ингредиентов из параметров запроса."""
+        try:
+            ingredient_ids = {
+                int(value)
+                for value in request.query_params.getlist('ingredients')
+            }
+        except ValueError:
+            raise serializers.ValidationError(
+                {'ingredients': 'Укажите ID ингредиентов целыми числами.'})
+        if not ingredient_ids:
+            raise serializers.ValidationError(
+                {'ingredients': 'Укажите ингредиенты.'})
+        if len(ingredient_ids) > constants.MATCH_MAX_INGREDIENTS:
+            raise serializers.ValidationError({
+                'ingredients': 'Укажите не больше '
+                f'{constants.MATCH_MAX_INGREDIENTS} ингредиентов.'
+            })
+        return ingredient_ids
+
+    def get_max_missing(self, request):
+        """Возвращает допустимое число недостающих ингредиентов."""
+        max_missing = request.query_params.get('max_missing')
+        if max_missing is None:
+            return None
+        try:
+            return _positive_int(max_missing)
+        except ValueError:
+            raise serializers.ValidationError(
+                {'max_missing': 'Укажите неотрицательное целое число.'})
+
+    @action(detail=True, methods=['GET'])
+    def similar(self, request, pk=None):
+        """Возвращает похожие рецепты из заранее построенного списка."""
+        try:
+            items = list(SimilarRecipe.objects.filter(
+                recipe_id=pk).select_related('similar').order_by(
+                '-score', 'similar_id'))
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound
+        if not items:
+            get_object_or_404(Recipe, pk=pk)
+        data = RecipeDemoSerializer(
+            [item.similar for item in items], many=True,
+            context=self.get_serializer_context()).data
+        for item, recipe in zip(items, data):
+            recipe['similarity'] = round(item.score, 3)
+        return Response(data)
 
     @action(detail=True, methods=['GET'], url_path='get-link')
     def get_short_link(self, request, pk=None):
@@ -216,30 +548,25 @@ class RecipeViewSet(viewsets.ModelViewSet, AddDelMixin):
         """Добавляет или удаляет рецепт из корзины покупок."""
         return self.handle_add_remove(request, pk, ShoppingCart)
 
-    @action(detail=False, methods=['GET'], url_path='download_shopping_cart')
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_path='download_shopping_cart',
+        renderer_classes=[PlainTextRenderer, CSVRenderer, JSONRenderer],
+    )
     def download_shopping_cart(self, request):
-        """Скачивает корзину покупок в виде текстового файла."""
-        user = request.user
-        response = HttpResponse(content_type='text/plain')
-
-        shopping_cart = ShoppingCart.objects.filter(
-            user=user).values_list('recipe', flat=True)
-
-        ingredients_sum = (
-            RecipeIngredient.objects.filter(recipe__in=shopping_cart)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(total_amount=Sum('amount'))
-            .order_by('ingredient__name')
-        )
-
-        response.write('Список покупок:\n\n'.encode('utf-8'))
-        for index, item in enumerate(ingredients_sum, start=1):
-            line = (
-                f'{index}. {item["ingredient__name"]} '
-                f'({item["ingredient__measurement_unit"]}) - '
-                f'{item["total_amount"]}\n'
-            )
-            response.write(line.encode('utf-8'))
+        """Скачивает корзину покупок в формате txt, csv или json.
+
+        Формат выбирается параметром format или заголовком Accept, файл
+        формируется построчно по мере чтения из базы.
+        """
+        renderer = request.accepted_renderer
+        chunks = STREAMS[renderer.format](get_shopping_list(request.user))
+        response = StreamingHttpResponse(
+            (chunk.encode('utf-8') for chunk in chunks),
+            content_type=f'{renderer.media_type}; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"')
         return response
 
     @action(detail=True, methods=['POST', 'DELETE'], url_path='favorite')
@@ -251,6 +578,29 @@ class RecipeViewSet(viewsets.ModelViewSet, AddDelMixin):
         """Сохраняет новый рецепт с аутентифицированным пользователем
         как автором."""
         serializer.save(author=self.request.user)
+        self.reload_instance(serializer)
+
+    def perform_update(self, serializer):
+        """Сохраняет изменения рецепта."""
+        serializer.save()
+        self.reload_instance(serializer)
+
+    def reload_instance(self, serializer):
+        """Перечитывает рецепт с предзагрузкой связей для ответа."""
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk)
+
+
+class MetricsView(views.APIView):
+    """Метрики запросов всех процессов в формате Prometheus."""
+    permission_classes = [IsAdminUser]  # Только для персонала
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        """Возвращает метрики в текстовом формате Prometheus."""
+        response = Response(metrics_store.render())
+        response['Cache-Control'] = 'no-store'
+        return response
 
 
 def redirect_short_link(request, short_id):
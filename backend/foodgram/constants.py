@@ -10,3 +10,113 @@ CONFIRMATION_CODE_MAX_LENGTH = 150
 
 
 NOT_ALLOWED_USERNAME = 'me'
+
+# Кэш избранного, корзины и подписок пользователей
+MEMBERSHIP_CACHE_MAX_USERS = 10000
+MEMBERSHIP_CACHE_TIMEOUT = 300  # Секунды до повторной загрузки из базы
+# Больше ID из кэша фильтр по избранному и корзине передает через JOIN
+MEMBERSHIP_FILTER_MAX_IDS = 500
+
+# Кэш ответов со списком и страницами рецептов для анонимных пользователей
+RESPONSE_CACHE_TIMEOUT = 60  # Ограничивает устаревание между процессами
+
+# Индекс ингредиентов для автодополнения
+INGREDIENT_INDEX_CHECK_INTERVAL = 30  # Секунды между проверками версии
+
+# Снимок справочника тегов и ингредиентов
+REFERENCE_DATA_CHECK_INTERVAL = 30  # Секунды между проверками версии
+REFERENCE_VERSION_LENGTH = 16  # Длина версии — префикса SHA-256 содержимого
+REFERENCE_MAX_AGE = 365 * 24 * 60 * 60  # Срок кэширования снимка клиентом
+
+# Загрузка изображений
+IMAGE_MAX_SIZE = 10 * 1024 * 1024  # Совпадает с client_max_body_size nginx
+BASE64_CHUNK_SIZE = 64 * 1024  # Кратно 4, чтобы части декодировались отдельно
+IMAGE_WORKERS = 2  # Потоки фоновой обработки изображений
+IMAGE_QUEUE_SIZE = 32  # Сверх этого числа задач обработка идет сразу
+# Допустимые форматы загружаемых изображений и расширения их файлов
+IMAGE_FORMAT_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'MPO': 'jpg',  # JPEG с несколькими кадрами с камер телефонов
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+IMAGE_JPEG_QUALITY = 85  # Качество при перекодировании загруженных JPEG
+
+# Производные изображения: вариант и наибольшие ширина и высота
+IMAGE_VARIANTS = {
+    'small': (200, 200),  # Аватары и мини-карточки рецептов
+    'medium': (600, 600),  # Карточки в списке рецептов
+}
+IMAGE_VARIANT_FORMAT = 'WEBP'
+IMAGE_VARIANT_EXTENSION = 'webp'
+IMAGE_VARIANT_QUALITY = 80
+
+# Загрузка ингредиентов из файла
+INGREDIENT_BATCH_SIZE = 500  # Строк в одном INSERT
+
+# Генерация синтетических данных
+DATASET_BATCH_SIZE = 5000  # Объектов в одном bulk_create
+DATASET_ZIPF_EXPONENT = 1.1  # Показатель степенного закона популярности
+DATASET_PARETO_SHAPE = 1.5  # Форма распределения активности пользователей
+DATASET_IMAGE_NAME = 'recipes/synthetic.png'  # Общее изображение рецептов
+
+# Замеры производительности API
+BENCHMARK_ITERATIONS = 20  # Замеров каждого сценария
+BENCHMARK_LATENCY_THRESHOLD = 2.0  # Допустимый рост медианы относительно базы
+BENCHMARK_MIN_REGRESSION_MS = 5  # Меньший рост медианы считается шумом
+
+# Метрики запросов в формате Prometheus
+METRICS_FLUSH_INTERVAL = 5  # Секунды между записями метрик процесса в файл
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+METRICS_SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Списки объектов в админке
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000  # Меньшие таблицы считаются точно
+
+# Полнотекстовый поиск рецептов
+SEARCH_MAX_RESULTS = 500  # Рецептов в выдаче поиска, лучших по рангу
+SEARCH_INDEX_CHECK_INTERVAL = 30  # Секунды между проверками версии
+SEARCH_UPDATE_CHUNK_SIZE = 500  # Рецептов в одном запросе переиндексации
+# Веса полей рецепта при ранжировании BM25
+SEARCH_WEIGHTS = {'name': 10.0, 'text': 1.0, 'ingredients': 5.0}
+BM25_K1 = 1.2  # Насыщение частоты термина
+BM25_B = 0.75  # Нормализация по длине документа
+
+# Битовый индекс тегов для подсчета фасетов
+TAG_INDEX_CHECK_INTERVAL = 30  # Секунды между проверками версии
+FACETS_TRUE_VALUES = ('1', 'true')  # Значения параметра facets для включения
+
+# Подбор рецептов по имеющимся ингредиентам
+MATCH_INDEX_CHECK_INTERVAL = 30  # Секунды между проверками версии
+MATCH_MAX_INGREDIENTS = 100  # Ингредиентов в одном запросе подбора
+
+# Лента рецептов авторов из подписок
+# У автора с большим числом подписчиков рецепты не копируются в ленты, а
+# читаются из его рецептов при запросе ленты.
+FEED_FANOUT_MAX_SUBSCRIBERS = 1000
+FEED_FANOUT_BATCH_SIZE = 500  # Записей ленты в одном INSERT
+FEED_FANOUT_WORKERS = 1  # Потоки фоновой рассылки рецептов в ленты
+FEED_FANOUT_QUEUE_SIZE = 64  # Сверх этого числа задач рассылка идет сразу
+# Последних рецептов автора в ленте при подписке: более старые рецепты в
+# ленту нового подписчика не попадают.
+FEED_BACKFILL_SIZE = 50
+
+# Похожие рецепты по составу ингредиентов (MinHash и LSH)
+SIMILAR_PERMUTATIONS = 64  # Длина сигнатуры MinHash
+SIMILAR_BANDS = 16  # Полос LSH: порог сходства около (1 / 16) ** (1 / 4)
+SIMILAR_SEED = 20240101  # Зерно хеш-функций, общее для всех процессов
+SIMILAR_RECIPES_LIMIT = 10  # Похожих рецептов у одного рецепта
+SIMILAR_MIN_SCORE = 0.2  # Минимальный коэффициент Жаккара
+# Корзины крупнее содержат почти одни базовые ингредиенты и пропускаются
+SIMILAR_MAX_BUCKET_SIZE = 200
+SIMILAR_BATCH_SIZE = 5000  # Строк в одном INSERT
+
+# Популярные рецепты и рецепты в трендах
+SCORE_FAVORITE_WEIGHT = 2  # Вес добавления в избранное
+SCORE_SHOPPING_CART_WEIGHT = 1  # Вес добавления в корзину покупок
+TRENDING_HALF_LIFE = 2 * 24 * 60 * 60  # Секунды до уменьшения веса вдвое
+TRENDING_MIN_SCORE = 0.01  # Меньшие рейтинги обнуляются при пересчете
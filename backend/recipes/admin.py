@@ -1,29 +1,41 @@
 from django.contrib import admin
 from django.db import models
+from django.db.models import Prefetch
 from django.forms import CheckboxSelectMultiple
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.paginators import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Админка для больших таблиц без точного подсчета строк."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Второй COUNT(*) для «из N»
 
 
 class RecipeIngredientInline(admin.TabularInline):
     """Inline для ингредиентов рецепта."""
     model = RecipeIngredient
     extra = 0
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     """Админка для рецептов."""
     list_display = (
         'name',
         'author',
-        'favorite_count',
+        'favorites_count',
         'get_tags',
     )
+    list_select_related = ('author',)
+    # Поиск по префиксу названия и точному имени автора.
     search_fields = [
-        'author__username',
-        'name',
+        '=author__username',
+        '^name',
     ]
+    raw_id_fields = ('author',)
     list_filter = [
         'tags',
     ]
@@ -53,16 +65,15 @@ class RecipeAdmin(admin.ModelAdmin):
         models.ManyToManyField: {'widget': CheckboxSelectMultiple},
     }
 
-    def favorite_count(self, obj):
-        """Возвращает количество добавлений в избранное."""
-        return Favorite.objects.filter(recipe=obj).count()
+    def get_queryset(self, request):
+        """Возвращает рецепты с заранее загруженными тегами."""
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('name')))
 
     def get_tags(self, obj):
         """Возвращает список тегов рецепта."""
-        return ', '.join(
-            obj.tags.values_list('name', flat=True).order_by('name'))
+        return ', '.join(tag.name for tag in obj.tags.all())
 
-    favorite_count.short_description = 'В избранном'
     get_tags.short_description = 'Теги'
 
 
@@ -88,12 +99,16 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     """Админка для избранных рецептов."""
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     """Админка для корзины покупок."""
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+# Счетчик: модель, поле счетчика, модель связи и поле связи с объектом.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счетчик объекта на delta, не опуская ниже нуля."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def actual_count(related_model, related_field):
+    """Возвращает подзапрос с фактическим количеством связанных записей."""
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{related_field: OuterRef('pk')})
+            .order_by()
+            .values(related_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def reconcile_counters():
+    """Пересчитывает все счетчики и возвращает число исправленных строк.
+
+    Каждый счетчик пересчитывается одним запросом UPDATE только для
+    строк, значение которых расходится с фактическим.
+    """
+    fixed = {}
+    for model, field, related_model, related_field in COUNTERS:
+        actual = actual_count(related_model, related_field)
+        fixed[f'{model._meta.model_name}.{field}'] = model.objects.exclude(
+            **{field: actual}).update(**{field: actual})
+    return fixed
@@ -0,0 +1,210 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from recipes.models import FeedItem, Recipe
+from users.models import Subscription
+
+from foodgram import constants
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+executor = ThreadPoolExecutor(
+    max_workers=constants.FEED_FANOUT_WORKERS,
+    thread_name_prefix='feed',
+)
+# Ограничивает очередь задач: при переполнении рецепт рассылается в
+# потоке запроса, а не теряется.
+queue_slots = threading.BoundedSemaphore(constants.FEED_FANOUT_QUEUE_SIZE)
+
+
+def batches(items, size):
+    """Разбивает итерируемый объект на списки не длиннее size."""
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def create_items(items):
+    """Сохраняет записи ленты пачками, пропуская уже существующие."""
+    for batch in batches(items, constants.FEED_FANOUT_BATCH_SIZE):
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def pull_author_ids(user):
+    """Возвращает ID авторов из подписок, рецепты которых не копируются
+    в ленты из-за большого числа подписчиков."""
+    return list(User.objects.filter(
+        subscribed_to__user=user,
+        subscribers_count__gt=constants.FEED_FANOUT_MAX_SUBSCRIBERS,
+    ).values_list('id', flat=True))
+
+
+def has_fanout(author_id):
+    """Проверяет, копируются ли рецепты автора в ленты подписчиков."""
+    return User.objects.filter(
+        pk=author_id,
+        subscribers_count__lte=constants.FEED_FANOUT_MAX_SUBSCRIBERS,
+    ).exists()
+
+
+def latest_recipes(author_id):
+    """Возвращает ID и время создания последних рецептов автора."""
+    return list(Recipe.objects.filter(
+        author_id=author_id).order_by('-created_at', '-id').values_list(
+        'id', 'created_at')[:constants.FEED_BACKFILL_SIZE])
+
+
+def subscriber_ids(author_id):
+    """Возвращает итератор по ID подписчиков автора."""
+    return Subscription.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True).iterator()
+
+
+def fan_out(recipe_id, author_id, created_at):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    if not has_fanout(author_id):
+        return
+    create_items(
+        FeedItem(
+            user_id=user_id,
+            recipe_id=recipe_id,
+            author_id=author_id,
+            created_at=created_at,
+        )
+        for user_id in subscriber_ids(author_id)
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика последние FEED_BACKFILL_SIZE рецептов
+    автора.
+
+    Более старые рецепты в ленту не попадают: при подписке на автора с
+    длинной историей лента начинается с его последних рецептов, что
+    ограничивает запись в потоке запроса одним INSERT.
+    """
+    if not has_fanout(author_id):
+        return
+    create_items(
+        FeedItem(
+            user_id=user_id,
+            recipe_id=recipe_id,
+            author_id=author_id,
+            created_at=created_at,
+        )
+        for recipe_id, created_at in latest_recipes(author_id)
+    )
+
+
+def refill(author_id):
+    """Добавляет последние рецепты автора в ленты всех его подписчиков.
+
+    Пока подписчиков больше FEED_FANOUT_MAX_SUBSCRIBERS, рецепты автора
+    не копируются в ленты и не добавляются новым подписчикам. Когда
+    автор опускается до порога, ленты дополняются, чтобы его рецепты не
+    пропали из них.
+    """
+    if not has_fanout(author_id):
+        return
+    recipes = latest_recipes(author_id)
+    create_items(
+        FeedItem(
+            user_id=user_id,
+            recipe_id=recipe_id,
+            author_id=author_id,
+            created_at=created_at,
+        )
+        for user_id in subscriber_ids(author_id)
+        for recipe_id, created_at in recipes
+    )
+
+
+def run_task(task, *args):
+    """Выполняет задачу в фоновом потоке и закрывает его соединения."""
+    try:
+        task(*args)
+    except Exception:
+        logger.exception('Ошибка обновления лент: %s%s', task.__name__, args)
+    finally:
+        queue_slots.release()
+        connections.close_all()
+
+
+def submit(task, *args):
+    """Ставит задачу в очередь или выполняет ее сразу, если очередь
+    заполнена."""
+    if not queue_slots.acquire(blocking=False):
+        logger.warning('Очередь обновления лент заполнена: %s', args)
+        task(*args)
+        return
+    executor.submit(run_task, task, *args)
+
+
+def schedule_fan_out(recipe):
+    """Планирует рассылку нового рецепта после фиксации транзакции.
+
+    Рассылка идет в фоновом потоке, поэтому время создания рецепта не
+    зависит от числа подписчиков автора. Потерянная при остановке
+    процесса рассылка восстанавливается командой rebuild_feeds.
+    """
+    args = (recipe.pk, recipe.author_id, recipe.created_at)
+    transaction.on_commit(lambda: submit(fan_out, *args))
+
+
+def schedule_refill(author_id):
+    """Планирует дополнение лент, если после отписки число подписчиков
+    автора опустилось до порога рассылки."""
+    if User.objects.filter(
+            pk=author_id,
+            subscribers_count=constants.FEED_FANOUT_MAX_SUBSCRIBERS,
+    ).exists():
+        transaction.on_commit(lambda: submit(refill, author_id))
+
+
+def remove(user_id, author_id):
+    """Удаляет рецепты автора из ленты отписавшегося пользователя."""
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild_feeds():
+    """Заполняет ленты заново по текущим подпискам и возвращает число
+    записей.
+
+    В ленту каждого подписчика попадают последние рецепты авторов, рецепты
+    которых копируются в ленты.
+    """
+    FeedItem.objects.all().delete()
+    author_ids = list(User.objects.filter(
+        subscribers_count__gt=0,
+        subscribers_count__lte=constants.FEED_FANOUT_MAX_SUBSCRIBERS,
+    ).values_list('id', flat=True))
+    total = 0
+    for chunk in batches(author_ids, constants.FEED_FANOUT_BATCH_SIZE):
+        recipes = defaultdict(list)
+        for recipe_id, author_id, created_at in (
+                Recipe.objects.latest_by_author(
+                    chunk, limit=constants.FEED_BACKFILL_SIZE).values_list(
+                    'id', 'author_id', 'created_at')):
+            recipes[author_id].append((recipe_id, created_at))
+        items = [
+            FeedItem(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                created_at=created_at,
+            )
+            for user_id, author_id in Subscription.objects.filter(
+                author_id__in=chunk).values_list(
+                'user_id', 'author_id').iterator()
+            for recipe_id, created_at in recipes[author_id]
+        ]
+        create_items(items)
+        total += len(items)
+    return total
@@ -0,0 +1,296 @@
+import gc
+import json
+import math
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from api.indexes import VersionedSnapshot
+from api.membership import membership_cache
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from rest_framework.test import APIClient
+from users.models import Subscription
+
+from foodgram import constants
+
+User = get_user_model()
+
+DEFAULT_BASELINE = settings.BASE_DIR / 'benchmarks' / 'baseline.json'
+# Размер синтетических данных, на которых выполняются замеры.
+DATASET_OPTIONS = ('users', 'recipes', 'favorites', 'carts',
+                   'subscriptions', 'seed')
+
+
+def percentile(values, share):
+    """Возвращает перцентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    return values[max(0, math.ceil(share * len(values)) - 1)]
+
+
+def reset_caches():
+    """Сбрасывает кэши процесса, чтобы замер начинался с холодного старта."""
+    caches['default'].clear()
+    membership_cache.invalidate()
+    VersionedSnapshot.invalidate_all()
+
+
+def top_user(model, field='user'):
+    """Возвращает ID пользователя с наибольшим числом записей модели."""
+    return model.objects.values(field).annotate(
+        total=Count('id')).order_by('-total', field)[0][field]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа и число запросов к базе основных '
+            'эндпоинтов API на синтетических данных')
+
+    def add_arguments(self, parser):
+        self.add_dataset_arguments(parser)
+        parser.add_argument(
+            '--iterations', type=int, default=constants.BENCHMARK_ITERATIONS)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не сбрасывать кэши между замерами')
+        parser.add_argument(
+            '--baseline', type=Path, default=DEFAULT_BASELINE,
+            help='Файл с базовыми результатами')
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Сохранить результаты как базовые')
+        parser.add_argument(
+            '--threshold', type=float,
+            default=constants.BENCHMARK_LATENCY_THRESHOLD,
+            help='Допустимый рост медианы относительно базовой')
+
+    def add_dataset_arguments(self, parser):
+        """Добавляет параметры синтетических данных и выбора сценариев."""
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--recipes', type=int, default=3000)
+        parser.add_argument('--favorites', type=int, default=30000)
+        parser.add_argument('--carts', type=int, default=3000)
+        parser.add_argument('--subscriptions', type=int, default=3000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='Запустить только указанные сценарии')
+
+    def handle(self, *args, **options):
+        dataset = {name: options[name] for name in DATASET_OPTIONS}
+        baseline = None
+        if not options['save'] and options['baseline'].exists():
+            baseline = json.loads(options['baseline'].read_text())
+            if baseline['dataset'] != dataset:
+                raise CommandError(
+                    'Базовые результаты получены на данных другого '
+                    f'размера: {baseline["dataset"]}.')
+        results = self.run(dataset, options)
+        if options['save']:
+            options['baseline'].parent.mkdir(parents=True, exist_ok=True)
+            options['baseline'].write_text(json.dumps(
+                {'dataset': dataset, 'scenarios': results},
+                ensure_ascii=False, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовые результаты сохранены в {options["baseline"]}.'))
+        scenarios = baseline['scenarios'] if baseline else {}
+        regressions = self.report(results, scenarios, options['threshold'])
+        if regressions:
+            raise CommandError(
+                'Обнаружено ухудшение производительности:\n'
+                + '\n'.join(regressions))
+
+    def run(self, dataset, options):
+        """Выполняет сценарии на временной тестовой базе."""
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Метрики замеров не попадают в общий каталог сервера.
+            with tempfile.TemporaryDirectory() as media_root, \
+                    tempfile.TemporaryDirectory() as metrics_dir, \
+                    override_settings(
+                        MEDIA_ROOT=media_root, METRICS_DIR=metrics_dir):
+                call_command('load_ingredients', stdout=StringIO())
+                call_command(
+                    'generate_dataset', stdout=StringIO(), **dataset)
+                scenarios = self.get_scenarios()
+                if options['scenarios']:
+                    unknown = set(options['scenarios']) - set(scenarios)
+                    if unknown:
+                        raise CommandError(
+                            f'Неизвестные сценарии: {", ".join(unknown)}.')
+                    scenarios = {
+                        name: scenarios[name]
+                        for name in options['scenarios']
+                    }
+                return {
+                    name: self.measure(client, requests, options)
+                    for name, (client, requests) in scenarios.items()
+                }
+        finally:
+            reset_caches()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def get_client(self, user_id=None):
+        """Возвращает клиент API, аутентифицированный как пользователь."""
+        client = APIClient()
+        if user_id is not None:
+            client.force_authenticate(User.objects.get(id=user_id))
+        return client
+
+    def get_scenarios(self):
+        """Возвращает сценарии: клиент и последовательность запросов."""
+        favorites_user = top_user(Favorite)
+        cart_user = top_user(ShoppingCart)
+        subscriber = top_user(Subscription)
+        author = top_user(Recipe, 'author')
+        recipe = top_user(Favorite, 'recipe')
+        # Рецепт вне избранного и корзины, чтобы переключение проходило
+        # полный цикл добавления и удаления.
+        toggled = Recipe.objects.exclude(
+            favorited_by__user=favorites_user).exclude(
+            in_shopping_cart__user=favorites_user).order_by('id')[0].id
+        tags = '&'.join(
+            f'tags={slug}' for slug in Tag.objects.order_by(
+                'id').values_list('slug', flat=True)[:2])
+        names = Ingredient.objects.order_by('id').values_list(
+            'name', flat=True)
+        query = names[len(names) // 2][:3]
+        # Набор продуктов: ингредиенты популярного рецепта и самые частые.
+        pantry = '&'.join(
+            f'ingredients={ingredient_id}' for ingredient_id in {
+                *RecipeIngredient.objects.filter(recipe=recipe).values_list(
+                    'ingredient_id', flat=True),
+                *RecipeIngredient.objects.values_list(
+                    'ingredient_id', flat=True).annotate(
+                    total=Count('id')).order_by('-total')[:5],
+            })
+        anonymous = self.get_client()
+        client = self.get_client(favorites_user)
+        return {
+            'recipes_list_anonymous': (
+                anonymous, [('get', '/api/recipes/')]),
+            'recipes_list': (client, [('get', '/api/recipes/')]),
+            'recipes_cursor': (client, [('get', '/api/recipes/?cursor=')]),
+            'recipes_popular': (
+                client, [('get', '/api/recipes/?ordering=popular&cursor=')]),
+            'recipes_trending': (
+                client, [('get', '/api/recipes/?ordering=trending&cursor=')]),
+            'recipes_tags': (client, [('get', f'/api/recipes/?{tags}')]),
+            'recipes_facets': (
+                client, [('get', f'/api/recipes/?facets=1&{tags}')]),
+            'recipes_search': (
+                client, [('get', f'/api/recipes/?search={query}')]),
+            'recipes_author': (
+                client, [('get', f'/api/recipes/?author={author}')]),
+            'recipes_favorited': (
+                client, [('get', '/api/recipes/?is_favorited=1')]),
+            'recipes_in_cart': (
+                self.get_client(cart_user),
+                [('get', '/api/recipes/?is_in_shopping_cart=1')]),
+            'recipe_detail': (client, [('get', f'/api/recipes/{recipe}/')]),
+            'recipe_similar': (
+                client, [('get', f'/api/recipes/{recipe}/similar/')]),
+            'recipes_by_ingredients': (
+                client,
+                [('get', f'/api/recipes/by_ingredients/?{pantry}')]),
+            'subscriptions': (
+                self.get_client(subscriber),
+                [('get', '/api/users/subscriptions/?recipes_limit=3')]),
+            'feed': (
+                self.get_client(subscriber),
+                [('get', '/api/recipes/feed/')]),
+            'ingredient_search': (
+                anonymous, [('get', f'/api/ingredients/?name={query}')]),
+            'download_shopping_cart': (
+                self.get_client(cart_user),
+                [('get', '/api/recipes/download_shopping_cart/')]),
+            'favorite_toggle': (client, [
+                ('post', f'/api/recipes/{toggled}/favorite/'),
+                ('delete', f'/api/recipes/{toggled}/favorite/'),
+            ]),
+            'shopping_cart_toggle': (client, [
+                ('post', f'/api/recipes/{toggled}/shopping_cart/'),
+                ('delete', f'/api/recipes/{toggled}/shopping_cart/'),
+            ]),
+        }
+
+    def request(self, client, method, path):
+        """Выполняет запрос и полностью читает ответ."""
+        response = getattr(client, method)(path)
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {path} вернул {response.status_code}.')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, client, requests, options):
+        """Замеряет сценарий и возвращает перцентили и число запросов."""
+        # Первый прогон не учитывается: он прогревает код и импорты.
+        for method, path in requests:
+            self.request(client, method, path)
+        timings = []
+        queries = 0
+        # Сборка мусора посреди замера дает случайные выбросы.
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(options['iterations']):
+                if not options['warm']:
+                    reset_caches()
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    for method, path in requests:
+                        self.request(client, method, path)
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries = max(queries, len(context))
+        finally:
+            gc.enable()
+        return {
+            'queries': queries,
+            'p50': round(percentile(timings, 0.5), 2),
+            'p95': round(percentile(timings, 0.95), 2),
+        }
+
+    def report(self, results, baseline, threshold):
+        """Выводит таблицу результатов и возвращает список ухудшений."""
+        regressions = []
+        self.stdout.write(
+            f'{"Сценарий":<26}{"Запросы":>9}{"p50, мс":>10}'
+            f'{"p95, мс":>10}{"База p50":>10}')
+        for name, result in results.items():
+            base = baseline.get(name)
+            line = (f'{name:<26}{result["queries"]:>9}'
+                    f'{result["p50"]:>10.2f}{result["p95"]:>10.2f}')
+            if base is None:
+                self.stdout.write(line)
+                continue
+            line += f'{base["p50"]:>10.2f}'
+            problems = []
+            if result['queries'] > base['queries']:
+                problems.append(
+                    f'запросов {result["queries"]} вместо {base["queries"]}')
+            # Медиана устойчивее к шуму, чем p95, поэтому порог по ней.
+            if (result['p50'] > base['p50'] * threshold
+                    and result['p50'] - base['p50']
+                    > constants.BENCHMARK_MIN_REGRESSION_MS):
+                problems.append(
+                    f'p50 {result["p50"]:.2f} мс вместо {base["p50"]:.2f}')
+            if problems:
+                regressions.append(f'{name}: {", ".join(problems)}')
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+        return regressions
@@ -0,0 +1,12 @@
+from django.core.management import BaseCommand
+from recipes.similarity import build_similar_recipes
+
+
+class Command(BaseCommand):
+    help = ('Строит списки похожих рецептов по составу ингредиентов '
+            'с помощью MinHash и LSH')
+
+    def handle(self, *args, **options):
+        recipes, pairs = build_similar_recipes()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {recipes}, похожих пар: {pairs}.'))
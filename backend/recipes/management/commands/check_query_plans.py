@@ -0,0 +1,92 @@
+import re
+
+from django.core.management import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.management.commands.benchmark import (DATASET_OPTIONS,
+                                                   reset_caches)
+from recipes.management.commands.benchmark import Command as BenchmarkCommand
+
+# Запросы, план которых проверяется. Служебные команды транзакций и
+# вставки пропускаются.
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+FULL_SCAN = re.compile(r'^SCAN (\S+)$')
+# Таблица с псевдонимом в SQL Django: "recipes_favorite" U0.
+TABLE_ALIAS = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+# Маленькие справочники, которые читаются целиком намеренно, и таблица
+# из одной строки с началом отсчета трендов.
+ALLOWED_TABLES = {
+    'recipes_tag', 'recipes_ingredient', 'recipes_trendingepoch'}
+# Полные сканирования, допустимые в отдельных сценариях.
+ALLOWED_SCANS = {
+    # Страница по порядку первичного ключа, ограниченная LIMIT.
+    'recipes_list_anonymous': {'recipes_recipe'},
+    'recipes_list': {'recipes_recipe'},
+    # Построение битовых карт тегов, повторяется только при смене версии.
+    'recipes_facets': {'recipes_recipe', 'recipes_recipe_tags'},
+    # Проверка версии обратного индекса ингредиентов.
+    'recipes_by_ingredients': {'recipes_recipe'},
+}
+
+
+class Command(BenchmarkCommand):
+    help = ('Проверяет планы SQL-запросов основных эндпоинтов API и '
+            'завершается с ошибкой при полном сканировании таблиц')
+
+    def add_arguments(self, parser):
+        self.add_dataset_arguments(parser)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов доступна только для SQLite.')
+        self.verbosity = options['verbosity']
+        options.update(iterations=1, warm=False)
+        dataset = {name: options[name] for name in DATASET_OPTIONS}
+        results = self.run(dataset, options)
+        problems = []
+        for name, scans in results.items():
+            allowed = ALLOWED_TABLES | ALLOWED_SCANS.get(name, set())
+            failed = [(table, sql) for table, sql in scans
+                      if table not in allowed]
+            if failed:
+                self.stdout.write(self.style.ERROR(name))
+            else:
+                self.stdout.write(self.style.SUCCESS(name))
+            for table, sql in failed:
+                problems.append(f'{name}: полное сканирование {table}')
+                self.stdout.write(f'  SCAN {table}: {sql}')
+        if problems:
+            raise CommandError(
+                'Запросы читают таблицы целиком:\n' + '\n'.join(problems))
+
+    def measure(self, client, requests, options):
+        """Возвращает полные сканирования таблиц в запросах сценария."""
+        reset_caches()
+        with CaptureQueriesContext(connection) as context:
+            for method, path in requests:
+                self.request(client, method, path)
+        tables = set(connection.introspection.table_names())
+        scans = []
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith(EXPLAINED):
+                continue
+            aliases = {
+                alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+            for detail in self.explain(sql):
+                if self.verbosity > 1:
+                    self.stdout.write(f'  {detail}')
+                match = FULL_SCAN.match(detail)
+                if match is None:
+                    continue
+                table = aliases.get(match[1], match[1])
+                # Сканирование подзапроса или CTE не читает таблицу.
+                if table in tables:
+                    scans.append((table, sql))
+        return scans
+
+    def explain(self, sql):
+        """Возвращает строки плана запроса."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[3] for row in cursor.fetchall()]
@@ -0,0 +1,276 @@
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from api.images import generate_derivatives
+from api.search import recipe_search
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from recipes.counters import reconcile_counters
+from recipes.feed import rebuild_feeds
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.scores import update_scores
+from recipes.similarity import build_similar_recipes
+from users.models import Subscription
+
+from foodgram import constants
+
+User = get_user_model()
+
+DEFAULT_TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+    ('Десерт', 'dessert'),
+    ('Выпечка', 'bakery'),
+    ('Салат', 'salad'),
+)
+
+
+def zipf_cum_weights(size, exponent=constants.DATASET_ZIPF_EXPONENT):
+    """Возвращает накопленные веса степенного закона для size элементов."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+class SkewedSampler:
+    """Выбирает элементы с популярностью по степенному закону.
+
+    Порядок популярности задается перемешиванием, поэтому самые
+    популярные элементы не совпадают с первыми созданными.
+    """
+
+    def __init__(self, rng, items):
+        self.rng = rng
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = zipf_cum_weights(len(self.items))
+
+    def sample(self, count, exclude=None):
+        """Возвращает до count различных элементов."""
+        count = min(count, len(self.items) - (exclude is not None))
+        chosen = set()
+        # Ограничение попыток не дает зациклиться на длинном хвосте.
+        for _ in range(count * 10):
+            if len(chosen) >= count:
+                break
+            item, = self.rng.choices(
+                self.items, cum_weights=self.cum_weights)
+            if item != exclude:
+                chosen.add(item)
+        return chosen
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетические данные для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--favorites', type=int, default=100000,
+            help='Примерное количество записей избранного')
+        parser.add_argument(
+            '--carts', type=int, default=20000,
+            help='Примерное количество записей корзины')
+        parser.add_argument(
+            '--subscriptions', type=int, default=20000,
+            help='Примерное количество подписок')
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, nargs=2,
+            default=(3, 12), metavar=('MIN', 'MAX'))
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней созданы рецепты')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help='Префикс имен создаваемых пользователей')
+        parser.add_argument(
+            '--password', default='password',
+            help='Пароль всех создаваемых пользователей')
+        parser.add_argument(
+            '--batch-size', type=int, default=constants.DATASET_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                'Нет ингредиентов, сначала выполните load_ingredients.')
+        if User.objects.filter(
+                username__startswith=f'{self.prefix}_').exists():
+            raise CommandError(
+                f'Пользователи с префиксом {self.prefix} уже есть, '
+                'укажите другой --prefix.')
+        started = time.monotonic()
+        image_name = self.create_image()
+        with transaction.atomic():
+            tag_ids = self.create_tags()
+            user_ids = self.create_users(
+                options['users'], options['password'])
+            recipe_ids, author_ids = self.create_recipes(
+                options['recipes'], user_ids, tag_ids, ingredient_ids,
+                options['ingredients_per_recipe'], options['days'],
+                image_name)
+            counts = {
+                'favorites': self.create_relations(
+                    Favorite, 'recipe_id', options['favorites'],
+                    user_ids, recipe_ids),
+                'carts': self.create_relations(
+                    ShoppingCart, 'recipe_id', options['carts'],
+                    user_ids, recipe_ids),
+                'subscriptions': self.create_relations(
+                    Subscription, 'author_id', options['subscriptions'],
+                    user_ids, author_ids, exclude_self=True),
+            }
+            # bulk_create не отправляет сигналы, обновляющие счетчики,
+            # популярность, поисковый индекс, ленты подписок и похожие
+            # рецепты.
+            reconcile_counters()
+            update_scores()
+            recipe_search.rebuild()
+            rebuild_feeds()
+            build_similar_recipes()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, рецептов: '
+            f'{len(recipe_ids)}, избранного: {counts["favorites"]}, '
+            f'корзины: {counts["carts"]}, подписок: '
+            f'{counts["subscriptions"]} за '
+            f'{time.monotonic() - started:.1f} с.'))
+
+    def create_image(self):
+        """Сохраняет общее изображение рецептов, если его еще нет."""
+        name = constants.DATASET_IMAGE_NAME
+        if not default_storage.exists(name):
+            image = Image.new('RGB', (800, 600), (230, 126, 34))
+            buffer = BytesIO()
+            image.save(buffer, format='PNG')
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            generate_derivatives(default_storage, name, image)
+        return name
+
+    def create_tags(self):
+        """Возвращает ID тегов, создавая стандартные при их отсутствии."""
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, slug=slug) for name, slug in DEFAULT_TAGS)
+        return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def bulk_create(self, model, objects):
+        """Создает объекты пачками и возвращает ID новых записей."""
+        # SQLite не возвращает ID из bulk_create, поэтому новые записи
+        # выбираются по ID больше максимального до вставки.
+        last_id = model.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        return list(model.objects.filter(id__gt=last_id).order_by(
+            'id').values_list('id', flat=True))
+
+    def create_users(self, count, password):
+        """Создает пользователей с одинаковым паролем."""
+        password = make_password(password)
+        return self.bulk_create(User, (
+            User(
+                username=f'{self.prefix}_{number}',
+                email=f'{self.prefix}_{number}@example.com',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            )
+            for number in range(count)
+        ))
+
+    def create_recipes(self, count, user_ids, tag_ids, ingredient_ids,
+                       ingredients_range, days, image_name):
+        """Создает рецепты пачками вместе с тегами и ингредиентами.
+
+        Возвращает ID созданных рецептов и ID их авторов.
+        """
+        authors = SkewedSampler(self.rng, user_ids)
+        ingredients = SkewedSampler(self.rng, ingredient_ids)
+        names = dict(Ingredient.objects.values_list('id', 'name'))
+        now = timezone.now()
+        recipe_ids = []
+        author_ids = set()
+        for offset in range(0, count, self.batch_size):
+            batch = []
+            for number in range(offset, min(count, offset + self.batch_size)):
+                chosen = ingredients.sample(
+                    self.rng.randint(*ingredients_range))
+                main = names[next(iter(chosen))]
+                author_id, = authors.sample(1)
+                author_ids.add(author_id)
+                batch.append((chosen, Recipe(
+                    author_id=author_id,
+                    name=f'{main.capitalize()} №{number}'[
+                        :constants.NAME_MAX_LENGTH],
+                    text=f'Синтетический рецепт №{number}.',
+                    image=image_name,
+                    cooking_time=self.rng.randint(5, 180),
+                    created_at=now - timedelta(
+                        seconds=self.rng.randrange(days * 24 * 60 * 60)),
+                )))
+            ids = self.bulk_create(Recipe, (recipe for _, recipe in batch))
+            RecipeIngredient.objects.bulk_create(
+                (
+                    RecipeIngredient(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=self.rng.randint(1, 500),
+                    )
+                    for recipe_id, (chosen, _) in zip(ids, batch)
+                    for ingredient_id in sorted(chosen)
+                ),
+                batch_size=self.batch_size,
+            )
+            Recipe.tags.through.objects.bulk_create(
+                (
+                    Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                    for recipe_id in ids
+                    for tag_id in self.rng.sample(
+                        tag_ids, self.rng.randint(1, min(3, len(tag_ids))))
+                ),
+                batch_size=self.batch_size,
+            )
+            recipe_ids += ids
+        return recipe_ids, sorted(author_ids)
+
+    def create_relations(self, model, target_field, total, user_ids,
+                         target_ids, exclude_self=False):
+        """Создает связи пользователей с объектами по степенному закону.
+
+        Количество связей пользователя распределено по Парето, а выбор
+        объектов смещен к популярным, как в реальных данных.
+        """
+        if not user_ids or not target_ids or total <= 0:
+            return 0
+        shape = constants.DATASET_PARETO_SHAPE
+        scale = total / len(user_ids) * (shape - 1) / shape
+        targets = SkewedSampler(self.rng, target_ids)
+        created = 0
+        batch = []
+        for user_id in user_ids:
+            count = round(scale * self.rng.paretovariate(shape))
+            exclude = user_id if exclude_self else None
+            for target_id in sorted(targets.sample(count, exclude)):
+                batch.append(
+                    model(user_id=user_id, **{target_field: target_id}))
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        model.objects.bulk_create(batch, batch_size=self.batch_size)
+        return created + len(batch)
@@ -0,0 +1,73 @@
+import posixpath
+
+from api.images import derivative_name, generate_derivatives, open_image
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+from recipes.models import Recipe
+
+from foodgram import constants
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии изображений рецептов и аватаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать уже существующие копии',
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Recipe.objects.exclude(image='').values_list('image', flat=True))
+        names += User.objects.exclude(avatar='').exclude(
+            avatar__isnull=True).values_list('avatar', flat=True)
+        # Одно изображение может использоваться несколькими рецептами.
+        names = dict.fromkeys(names)
+        # Имена файлов каталогов хранилища, прочитанные по одному разу.
+        self.listed = {}
+        created = skipped = failed = 0
+        for name in names:
+            if not options['force'] and self.has_derivatives(name):
+                skipped += 1
+                continue
+            try:
+                image, _ = open_image(default_storage, name)
+                generate_derivatives(default_storage, name, image)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(
+                    self.style.ERROR(f'Ошибка обработки {name}: {e}'))
+                continue
+            created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {created}, пропущено: {skipped}, '
+            f'с ошибками: {failed}.'))
+
+    def list_files(self, directory):
+        """Возвращает множество имен файлов каталога хранилища."""
+        files = self.listed.get(directory)
+        if files is None:
+            try:
+                files = set(default_storage.listdir(directory)[1])
+            except FileNotFoundError:
+                files = set()
+            self.listed[directory] = files
+        return files
+
+    def has_derivatives(self, name):
+        """Проверяет, что все копии изображения уже созданы.
+
+        Каталог читается один раз вместо проверки каждой копии
+        отдельным запросом к хранилищу.
+        """
+        directory = posixpath.dirname(name)
+        files = self.list_files(directory)
+        return all(
+            posixpath.basename(derivative_name(name, variant)) in files
+            for variant in constants.IMAGE_VARIANTS
+        )
@@ -1,31 +1,78 @@
 import csv
+import json
+import time
+from pathlib import Path
 
-from django.core.management import BaseCommand
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
 from recipes.models import Ingredient
 
+from foodgram import constants
 
-class Command(BaseCommand):
-    help = 'Загружает ингредиенты из CSV в базу данных'
+DEFAULT_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+FORMATS = ('csv', 'json')
 
-    def handle(self, *args, **options):
-        self.import_ingredients()
 
-    def import_ingredients(self, file='data/ingredients.csv'):
-        """Импортирует ингредиенты из указанного CSV-файла."""
-        file_path = '/Users/yaroslav/Dev/foodgram/data/ingredients.csv'
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON в базу данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=DEFAULT_PATH,
+            type=Path,
+            help='Путь к файлу с ингредиентами',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файла, по умолчанию определяется по расширению',
+        )
 
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(f'Неизвестный формат файла {path}.')
+        started = time.monotonic()
         try:
-            with open(file_path, newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    name = row[0]
-                    measurement_unit = row[1]
-                    Ingredient.objects.update_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
-            self.stdout.write(self.style.SUCCESS('Ингредиенты загружены.'))
+            rows = set(getattr(self, f'read_{file_format}')(path))
         except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f'Файл {file_path} не найден.'))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Ошибка при загрузке: {e}'))
+            raise CommandError(f'Файл {path} не найден.')
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise CommandError(f'Ошибка чтения {path}: {e}')
+        created = self.import_ingredients(rows)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты загружены: в файле {len(rows)}, добавлено '
+            f'{created}, уже были {len(rows) - created} '
+            f'за {time.monotonic() - started:.2f} с.'))
+
+    def read_csv(self, path):
+        """Читает пары название — единица измерения из CSV."""
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if row:
+                    yield row[0].strip(), row[1].strip()
+
+    def read_json(self, path):
+        """Читает пары название — единица измерения из JSON."""
+        with open(path, encoding='utf-8') as f:
+            for item in json.load(f):
+                yield item['name'].strip(), item['measurement_unit'].strip()
+
+    @transaction.atomic
+    def import_ingredients(self, rows):
+        """Добавляет отсутствующие в базе ингредиенты."""
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit'))
+        new = sorted(rows - existing)
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in new
+            ],
+            batch_size=constants.INGREDIENT_BATCH_SIZE,
+        )
+        return len(new)
@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписок заново по текущим подпискам'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        total = rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты заполнены, записей: {total}.'))
@@ -0,0 +1,10 @@
+from api.search import recipe_search
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс рецептов'
+
+    def handle(self, *args, **options):
+        recipe_search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
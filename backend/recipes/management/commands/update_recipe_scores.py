@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+from recipes.scores import update_scores
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинг рецептов в трендах от текущего момента '
+            'и исправляет популярность')
+
+    def handle(self, *args, **options):
+        decayed, fixed = update_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтингов в трендах пересчитано: {decayed}, '
+            f'популярность исправлена: {fixed}.'))
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+CREATE_TABLE = (
+    'CREATE VIRTUAL TABLE recipes_search USING fts5('
+    "name, text, ingredients, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+
+def fold(expression):
+    return f"replace(replace({expression}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+FILL_TABLE = (
+    'INSERT INTO recipes_search (rowid, name, text, ingredients) '
+    f'SELECT recipe.id, {fold("recipe.name")}, {fold("recipe.text")}, '
+    + fold(
+        "COALESCE((SELECT group_concat(ingredient.name, ' ') "
+        'FROM recipes_recipeingredient item '
+        'JOIN recipes_ingredient ingredient '
+        'ON ingredient.id = item.ingredient_id '
+        "WHERE item.recipe_id = recipe.id), '')"
+    )
+    + ' FROM recipes_recipe recipe'
+)
+
+
+def has_fts5(schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_table(apps, schema_editor):
+    # Без FTS5 поиск работает по индексу в памяти процесса.
+    if has_fts5(schema_editor):
+        schema_editor.execute(CREATE_TABLE)
+        schema_editor.execute(FILL_TABLE)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS recipes_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
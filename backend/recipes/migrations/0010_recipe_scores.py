@@ -0,0 +1,77 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:15
+
+import time
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Веса на момент миграции: SCORE_FAVORITE_WEIGHT, SCORE_SHOPPING_CART_WEIGHT.
+FAVORITE_WEIGHT = 2
+SHOPPING_CART_WEIGHT = 1
+
+
+def count_related(model, related_field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{related_field: OuterRef('pk')})
+            .order_by()
+            .values(related_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def fill_scores(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    TrendingEpoch = apps.get_model('recipes', 'TrendingEpoch')
+    # Время прошлых событий неизвестно, поэтому рейтинг в трендах
+    # начинается с нуля.
+    TrendingEpoch.objects.create(started_at=time.time())
+    Recipe.objects.update(
+        popularity=FAVORITE_WEIGHT * count_related(Favorite, 'recipe')
+        + SHOPPING_CART_WEIGHT * count_related(ShoppingCart, 'recipe'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.FloatField(verbose_name='Начало отсчета, Unix-время')),
+            ],
+            options={
+                'verbose_name': 'начало отсчета трендов',
+                'verbose_name_plural': 'Начало отсчета трендов',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг в трендах'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popularity', '-id'], name='recipe_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-id'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,11 @@ import shortuuid
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.utils import timezone
+from users.models import CounterFieldsMixin
 
 from foodgram import constants
 
@@ -19,6 +23,10 @@ class Ingredient(models.Model):
         max_length=constants.MEASUREMENT_MAX_LENGTH,
         verbose_name='Единица измерения'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         verbose_name = 'ингредиент'
@@ -38,6 +46,10 @@ class Tag(models.Model):
         max_length=constants.TAG_MAX_LENGTH, unique=True,
         verbose_name='Слаг'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         verbose_name = 'тэг'
@@ -47,7 +59,34 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet для рецептов."""
+
+    def latest_by_author(self, author_ids, limit=None):
+        """Возвращает последние рецепты авторов, не больше limit на автора.
+
+        Ограничение на автора считается оконной функцией ROW_NUMBER в
+        подзапросе, поэтому выборка остается одним запросом.
+        """
+        queryset = self.filter(author_id__in=author_ids)
+        if limit is not None:
+            ranked = queryset.annotate(
+                row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=[F('author_id')],
+                    order_by=[F('created_at').desc(), F('id').desc()],
+                )
+            ).order_by().values('id', 'row_number')
+            sql, params = ranked.query.sql_with_params()
+            queryset = self.filter(id__in=RawSQL(
+                f'SELECT ranked.id FROM ({sql}) ranked '
+                'WHERE ranked.row_number <= %s',
+                (*params, limit),
+            ))
+        return queryset.order_by('author_id', '-created_at', '-id')
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель для рецепта."""
     tags = models.ManyToManyField(
         Tag,
@@ -58,7 +97,9 @@ class Recipe(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        # Поиск по автору покрывает индекс recipe_author_created_idx.
+        db_index=False,
     )
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -86,6 +127,30 @@ class Recipe(models.Model):
         verbose_name='Короткая ссылка',
     )
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    popularity = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность'
+    )
+    # Сумма весов событий, умноженных на exp((t - начало отсчета) / tau):
+    # порядок по значению совпадает с порядком по затухающему рейтингу.
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Рейтинг в трендах'
+    )
+
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'popularity', 'trending_score')
 
     def get_or_create_short_link(self):
         """Создает короткую ссылку, если она отсутствует."""
@@ -97,6 +162,21 @@ class Recipe(models.Model):
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            # Курсорная пагинация от новых рецептов к старым.
+            models.Index(
+                fields=['created_at', 'id'], name='recipe_created_idx'),
+            # Последние рецепты авторов в подписках и фильтр по автору.
+            models.Index(
+                fields=['author', '-created_at', '-id'],
+                name='recipe_author_created_idx'),
+            # Сортировки ordering=popular и ordering=trending.
+            models.Index(
+                fields=['-popularity', '-id'], name='recipe_popularity_idx'),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                name='recipe_trending_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -147,6 +227,13 @@ class Favorite(models.Model):
         related_name='favorited_by',
         verbose_name='Рецепт',
     )
+    # Время события для вычитания его вклада в рейтинг трендов; пусто у
+    # записей, добавленных до появления поля.
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        null=True,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         verbose_name = 'избранное'
@@ -174,6 +261,12 @@ class ShoppingCart(models.Model):
         related_name='in_shopping_cart',
         verbose_name='Рецепт',
     )
+    # Пусто у записей, добавленных до появления поля.
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        null=True,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -185,3 +278,116 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe.name} в корзине у {self.user.username}'
+
+
+class FeedItem(models.Model):
+    """Модель для записи ленты рецептов подписчика.
+
+    Запись создается при публикации рецепта автором, на которого
+    подписан пользователь; время публикации копируется из рецепта, чтобы
+    страница ленты читалась по индексу без JOIN.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    created_at = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(name='unique_feed_item',
+                                    fields=['user', 'recipe'])
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-recipe'],
+                         name='feed_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe.name} в ленте у {self.user.username}'
+
+
+class SimilarRecipe(models.Model):
+    """Модель для похожего рецепта, найденного по составу ингредиентов."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(name='unique_similar_recipe',
+                                    fields=['recipe', 'similar'])
+        ]
+
+    def __str__(self):
+        return f'{self.similar.name} похож на {self.recipe.name}'
+
+
+class RecipeBucket(models.Model):
+    """Модель для корзины LSH, в которую попал рецепт.
+
+    Рецепты с общей корзиной — кандидаты в похожие.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+        verbose_name='Рецепт',
+    )
+    bucket = models.BigIntegerField(db_index=True, verbose_name='Корзина')
+
+    class Meta:
+        verbose_name = 'корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        constraints = [
+            models.UniqueConstraint(name='unique_recipe_bucket',
+                                    fields=['recipe', 'bucket'])
+        ]
+
+    def __str__(self):
+        return f'{self.recipe.name}: {self.bucket}'
+
+
+class TrendingEpoch(models.Model):
+    """Модель для начала отсчета рейтинга в трендах.
+
+    Единственная запись переносится на текущий момент командой
+    update_recipe_scores вместе с пересчетом рейтингов, чтобы значения
+    не росли неограниченно.
+    """
+    started_at = models.FloatField(verbose_name='Начало отсчета, Unix-время')
+
+    class Meta:
+        verbose_name = 'начало отсчета трендов'
+        verbose_name_plural = 'Начало отсчета трендов'
+
+    def __str__(self):
+        return str(self.started_at)
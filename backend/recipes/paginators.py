@@ -0,0 +1,44 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from foodgram import constants
+
+
+def estimate_count(queryset):
+    """Возвращает оценку числа строк таблицы без полного подсчета.
+
+    PostgreSQL хранит оценку в статистике таблицы, в остальных базах
+    оценкой служит наибольший первичный ключ, который читается по
+    индексу за одно обращение.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row else 0
+    return model._default_manager.using(queryset.db).aggregate(
+        last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки с оценкой размера больших таблиц.
+
+    Точный COUNT(*) выполняется только для отфильтрованных списков и
+    для таблиц меньше ADMIN_ESTIMATED_COUNT_THRESHOLD строк.
+    """
+
+    @cached_property
+    def count(self):
+        """Возвращает оценку или точное число объектов."""
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset)
+            if estimate > constants.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
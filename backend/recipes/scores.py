@@ -0,0 +1,76 @@
+import math
+import time
+
+from django.db import transaction
+from django.db.models import F, FloatField, Subquery, Value
+from django.db.models.functions import Coalesce, Exp, Greatest
+from recipes.counters import actual_count
+from recipes.models import Favorite, Recipe, ShoppingCart, TrendingEpoch
+
+from foodgram import constants
+
+# Время жизни tau, за которое вес события уменьшается в e раз.
+TRENDING_LIFETIME = constants.TRENDING_HALF_LIFE / math.log(2)
+
+# Вес события каждой модели связи с рецептом.
+SCORE_WEIGHTS = {
+    Favorite: constants.SCORE_FAVORITE_WEIGHT,
+    ShoppingCart: constants.SCORE_SHOPPING_CART_WEIGHT,
+}
+
+
+def change_scores(recipe_id, weight, created_at):
+    """Изменяет популярность и рейтинг в трендах рецепта на вес события.
+
+    Вклад события в тренды — вес, умноженный на exp((время события -
+    начало отсчета) / tau), поэтому старые события не пересчитываются, а
+    их относительный вклад уменьшается сам. Отрицательный вес отменяет
+    событие, вычитая его собственный вклад. У событий без времени
+    меняется только популярность.
+    """
+    updates = {'popularity': Greatest(F('popularity') + weight, 0)}
+    if created_at is not None:
+        happened_at = created_at.timestamp()
+        started_at = Coalesce(
+            Subquery(TrendingEpoch.objects.values('started_at')[:1]),
+            Value(happened_at),
+            output_field=FloatField(),
+        )
+        boost = Exp(
+            (Value(happened_at) - started_at) / Value(TRENDING_LIFETIME))
+        # Ограничение снизу гасит погрешность округления и обнуление
+        # малых рейтингов в update_scores.
+        updates['trending_score'] = Greatest(
+            F('trending_score') + Value(float(weight)) * boost, Value(0.0))
+    Recipe.objects.filter(pk=recipe_id).update(**updates)
+
+
+@transaction.atomic
+def update_scores():
+    """Переносит начало отсчета трендов на текущий момент и пересчитывает
+    популярность.
+
+    Возвращает число рецептов с пересчитанным рейтингом в трендах и число
+    исправленных значений популярности.
+    """
+    now = time.time()
+    epoch = TrendingEpoch.objects.select_for_update().first()
+    if epoch is None:
+        epoch = TrendingEpoch(started_at=now)
+    factor = math.exp(-(now - epoch.started_at) / TRENDING_LIFETIME)
+    decayed = Recipe.objects.filter(trending_score__gt=0).update(
+        trending_score=F('trending_score') * factor)
+    # Исчезающе малые рейтинги обнуляются, чтобы не пересчитывать их снова.
+    Recipe.objects.filter(
+        trending_score__gt=0,
+        trending_score__lt=constants.TRENDING_MIN_SCORE,
+    ).update(trending_score=0)
+    epoch.started_at = now
+    epoch.save()
+    popularity = sum(
+        weight * actual_count(model, 'recipe')
+        for model, weight in SCORE_WEIGHTS.items()
+    )
+    fixed = Recipe.objects.exclude(popularity=popularity).update(
+        popularity=popularity)
+    return decayed, fixed
@@ -0,0 +1,119 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes import feed, similarity
+from recipes.counters import change_counter
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from recipes.scores import SCORE_WEIGHTS, change_scores
+from users.models import Subscription
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    """Увеличивает счетчик избранного рецепта."""
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    """Уменьшает счетчик избранного рецепта."""
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    """Увеличивает счетчик рецептов автора."""
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    """Уменьшает счетчик рецептов автора."""
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(sender, instance, created, **kwargs):
+    """Увеличивает счетчик подписчиков автора."""
+    if created:
+        change_counter(User, instance.author_id, 'subscribers_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(sender, instance, **kwargs):
+    """Уменьшает счетчик подписчиков автора."""
+    change_counter(User, instance.author_id, 'subscribers_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    if created:
+        feed.schedule_fan_out(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(sender, instance, created, **kwargs):
+    """Добавляет рецепты автора в ленту нового подписчика."""
+    if created:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_feed(sender, instance, **kwargs):
+    """Удаляет рецепты автора из ленты отписавшегося пользователя и
+    дополняет ленты остальных, если автор опустился до порога рассылки.
+
+    Счетчик подписчиков к этому моменту уже уменьшен обработчиком выше.
+    """
+    feed.remove(instance.user_id, instance.author_id)
+    feed.schedule_refill(instance.author_id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def update_ingredient_similar_recipes(sender, instance, **kwargs):
+    """Пересчитывает похожие рецепты при изменении ингредиентов.
+
+    Ингредиенты, записанные через bulk_create, сигналов не отправляют,
+    поэтому сериализатор рецепта планирует пересчет сам.
+    """
+    similarity.schedule_update(instance.recipe_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+def increment_membership_version(sender, instance, created, **kwargs):
+    """Увеличивает версию отметок пользователя при добавлении."""
+    if created:
+        change_counter(User, instance.user_id, 'membership_version', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def increment_membership_version_on_delete(sender, instance, **kwargs):
+    """Увеличивает версию отметок пользователя при удалении."""
+    change_counter(User, instance.user_id, 'membership_version', 1)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increase_scores(sender, instance, created, **kwargs):
+    """Повышает популярность и рейтинг в трендах рецепта."""
+    if created:
+        change_scores(
+            instance.recipe_id, SCORE_WEIGHTS[sender], instance.created_at)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_scores(sender, instance, **kwargs):
+    """Понижает популярность и рейтинг в трендах рецепта."""
+    change_scores(
+        instance.recipe_id, -SCORE_WEIGHTS[sender], instance.created_at)
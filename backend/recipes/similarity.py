@@ -0,0 +1,214 @@
+import hashlib
+import heapq
+import random
+from array import array
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from recipes.models import RecipeBucket, RecipeIngredient, SimilarRecipe
+from recipes.transactions import on_commit_batch
+
+from foodgram import constants
+
+# Простое число Мерсенна 2^61 - 1 — модуль универсальных хеш-функций.
+PRIME = (1 << 61) - 1
+
+
+class MinHasher:
+    """Сигнатуры MinHash множеств ингредиентов и корзины LSH.
+
+    Сигнатура — минимумы значений permutations хеш-функций по
+    ингредиентам рецепта; совпадение позиции сигнатуры у двух рецептов
+    происходит с вероятностью, равной их коэффициенту Жаккара. Сигнатура
+    делится на bands полос, и рецепты с одинаковой полосой попадают в одну
+    корзину.
+    """
+
+    def __init__(self, permutations, bands, seed):
+        rng = random.Random(seed)
+        self.coefficients = [
+            (rng.randrange(1, PRIME), rng.randrange(PRIME))
+            for _ in range(permutations)
+        ]
+        self.bands = bands
+        self.rows = permutations // bands
+        self._hashes = {}
+
+    def hashes(self, ingredient_id):
+        """Возвращает значения всех хеш-функций для ингредиента."""
+        hashes = self._hashes.get(ingredient_id)
+        if hashes is None:
+            hashes = tuple(
+                (a * ingredient_id + b) % PRIME
+                for a, b in self.coefficients
+            )
+            self._hashes[ingredient_id] = hashes
+        return hashes
+
+    def signature(self, ingredient_ids):
+        """Возвращает сигнатуру MinHash множества ингредиентов."""
+        return tuple(map(min, zip(*map(self.hashes, ingredient_ids))))
+
+    def buckets(self, signature):
+        """Возвращает корзины LSH для каждой полосы сигнатуры.
+
+        Номер корзины — 64-битный хеш номера и значений полосы, поэтому
+        он не зависит от процесса и версии Python.
+        """
+        return [
+            int.from_bytes(
+                hashlib.blake2b(
+                    array('q', (band, *signature[
+                        band * self.rows:(band + 1) * self.rows])).tobytes(),
+                    digest_size=8,
+                ).digest(),
+                'little',
+                signed=True,
+            )
+            for band in range(self.bands)
+        ]
+
+
+hasher = MinHasher(
+    permutations=constants.SIMILAR_PERMUTATIONS,
+    bands=constants.SIMILAR_BANDS,
+    seed=constants.SIMILAR_SEED,
+)
+
+
+def jaccard(first, second):
+    """Возвращает коэффициент Жаккара двух множеств."""
+    return len(first & second) / len(first | second)
+
+
+def top_similar(ingredients, candidates, sets):
+    """Возвращает лучшие пары (ID рецепта, сходство) среди кандидатов."""
+    scores = (
+        (candidate, jaccard(ingredients, sets[candidate]))
+        for candidate in candidates
+    )
+    return heapq.nlargest(
+        constants.SIMILAR_RECIPES_LIMIT,
+        (item for item in scores
+         if item[1] >= constants.SIMILAR_MIN_SCORE),
+        key=lambda item: (item[1], -item[0]),
+    )
+
+
+def ingredient_sets(recipe_ids=None):
+    """Возвращает множества ID ингредиентов рецептов."""
+    queryset = RecipeIngredient.objects.all()
+    if recipe_ids is not None:
+        queryset = queryset.filter(recipe_id__in=recipe_ids)
+    sets = defaultdict(set)
+    for recipe_id, ingredient_id in queryset.values_list(
+            'recipe_id', 'ingredient_id').iterator():
+        sets[recipe_id].add(ingredient_id)
+    return sets
+
+
+@transaction.atomic
+def build_similar_recipes():
+    """Строит корзины LSH и списки похожих рецептов для всех рецептов.
+
+    Возвращает число рецептов и число сохраненных пар.
+    """
+    sets = ingredient_sets()
+    members = defaultdict(list)
+    for recipe_id, ingredients in sets.items():
+        for bucket in hasher.buckets(hasher.signature(ingredients)):
+            members[bucket].append(recipe_id)
+    candidates = defaultdict(set)
+    buckets = []
+    for bucket, recipe_ids in members.items():
+        if len(recipe_ids) > constants.SIMILAR_MAX_BUCKET_SIZE:
+            continue
+        for recipe_id in recipe_ids:
+            buckets.append(RecipeBucket(recipe_id=recipe_id, bucket=bucket))
+            if len(recipe_ids) > 1:
+                candidates[recipe_id].update(recipe_ids)
+    similar = [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=other_id, score=score)
+        for recipe_id, recipe_candidates in candidates.items()
+        for other_id, score in top_similar(
+            sets[recipe_id], recipe_candidates - {recipe_id}, sets)
+    ]
+    RecipeBucket.objects.all().delete()
+    SimilarRecipe.objects.all().delete()
+    RecipeBucket.objects.bulk_create(
+        buckets, batch_size=constants.SIMILAR_BATCH_SIZE)
+    SimilarRecipe.objects.bulk_create(
+        similar, batch_size=constants.SIMILAR_BATCH_SIZE)
+    return len(sets), len(similar)
+
+
+@transaction.atomic
+def update_similar_recipes(recipe_id):
+    """Пересчитывает похожие рецепты после изменения ингредиентов.
+
+    Рецепт получает новый список похожих и добавляется в списки
+    кандидатов, если сходит за одного из их лучших. Из списков, где рецепт
+    перестал быть похожим, он удаляется без замены до следующего
+    построения командой build_similar_recipes.
+    """
+    ingredients = ingredient_sets([recipe_id])[recipe_id]
+    RecipeBucket.objects.filter(recipe_id=recipe_id).delete()
+    SimilarRecipe.objects.filter(
+        Q(recipe_id=recipe_id) | Q(similar_id=recipe_id)).delete()
+    if not ingredients:
+        return
+    buckets = hasher.buckets(hasher.signature(ingredients))
+    members = defaultdict(set)
+    for bucket, other_id in RecipeBucket.objects.filter(
+            bucket__in=buckets).values_list('bucket', 'recipe_id')[
+            :constants.SIMILAR_MAX_BUCKET_SIZE * len(buckets)]:
+        members[bucket].add(other_id)
+    RecipeBucket.objects.bulk_create(
+        RecipeBucket(recipe_id=recipe_id, bucket=bucket)
+        for bucket in buckets)
+    candidates = set().union(*(
+        recipe_ids for recipe_ids in members.values()
+        if len(recipe_ids) < constants.SIMILAR_MAX_BUCKET_SIZE
+    ))
+    sets = ingredient_sets(candidates)
+    scores = {
+        other_id: jaccard(ingredients, sets[other_id])
+        for other_id in candidates
+    }
+    to_create = [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=other_id, score=score)
+        for other_id, score in top_similar(ingredients, candidates, sets)
+    ]
+    lists = defaultdict(list)
+    for row in SimilarRecipe.objects.filter(recipe_id__in=[
+            other_id for other_id, score in scores.items()
+            if score >= constants.SIMILAR_MIN_SCORE]):
+        lists[row.recipe_id].append(row)
+    to_delete = []
+    for other_id, score in scores.items():
+        if score < constants.SIMILAR_MIN_SCORE:
+            continue
+        rows = lists[other_id]
+        if len(rows) >= constants.SIMILAR_RECIPES_LIMIT:
+            weakest = min(rows, key=lambda row: (row.score, -row.similar_id))
+            if (score, -recipe_id) <= (weakest.score, -weakest.similar_id):
+                continue
+            to_delete.append(weakest.pk)
+        to_create.append(SimilarRecipe(
+            recipe_id=other_id, similar_id=recipe_id, score=score))
+    SimilarRecipe.objects.filter(pk__in=to_delete).delete()
+    SimilarRecipe.objects.bulk_create(
+        to_create, batch_size=constants.SIMILAR_BATCH_SIZE)
+
+
+def update_many_similar_recipes(recipe_ids):
+    """Пересчитывает похожие рецепты для каждого из рецептов."""
+    for recipe_id in recipe_ids:
+        update_similar_recipes(recipe_id)
+
+
+def schedule_update(recipe_id):
+    """Пересчитывает похожие рецепты после фиксации транзакции, один раз
+    за транзакцию."""
+    on_commit_batch(update_many_similar_recipes, [recipe_id])
@@ -0,0 +1,43 @@
+from django.db import transaction
+
+
+class CommitBatch(set):
+    """ID объектов, накопленные в блоке atomic для одного обработчика."""
+
+    def __init__(self, callback, pending, key):
+        super().__init__()
+        self.callback = callback
+        self.pending = pending
+        self.key = key
+
+    def __call__(self):
+        if self.pending.get(self.key) is self:
+            del self.pending[self.key]
+        self.callback(sorted(self))
+
+
+def on_commit_batch(callback, object_ids, using=None):
+    """Вызывает callback со списком ID после фиксации транзакции.
+
+    Повторные вызовы с тем же callback в одном блоке atomic только
+    добавляют ID, поэтому обработчик выполняется один раз, сколько бы
+    строк ни изменилось. callback должен быть одним и тем же объектом или
+    методом одного объекта.
+    """
+    connection = transaction.get_connection(using)
+    pending = connection.__dict__.setdefault('commit_batches', {})
+    if not connection.run_on_commit:
+        # Отложенных вызовов нет: пачки откаченных транзакций не нужны.
+        pending.clear()
+    # Пачка привязана к последней точке сохранения: при ее откате Django
+    # отменяет вызов, а новые ID попадают в пачку другого блока.
+    savepoint_id = next(
+        (sid for sid in reversed(connection.savepoint_ids) if sid), None)
+    key = (callback, savepoint_id)
+    batch = pending.get(key)
+    if batch is None:
+        batch = pending[key] = CommitBatch(callback, pending, key)
+        batch.update(object_ids)
+        transaction.on_commit(batch, using)
+    else:
+        batch.update(object_ids)
@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from recipes.models import Favorite, Recipe
+from recipes.admin import LargeTableAdmin
+from recipes.counters import actual_count
+from recipes.models import Favorite
+from recipes.paginators import EstimatedCountPaginator
 from users.models import CustomUser, Subscription
 
 
@@ -15,9 +18,13 @@ class CustomUserAdmin(UserAdmin):
         'is_superuser',
         'subscriptions_count',
         'recipes_count',
+        'subscribers_count',
         'favorited_recipes_count'
     )
-    search_fields = ('email', 'username')
+    # Поиск по префиксу использует уникальные индексы полей.
+    search_fields = ('^email', '^username')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (None, {'fields': ('username', 'email', 'password')}),
         ('Персональная информация', {
@@ -45,23 +52,29 @@ class CustomUserAdmin(UserAdmin):
     )
     ordering = ('username',)
 
-    @admin.display(description='Количество подписок')
+    def get_queryset(self, request):
+        """Возвращает пользователей с количеством подписок и избранного."""
+        return super().get_queryset(request).annotate(
+            subscriptions_total=actual_count(Subscription, 'user'),
+            favorites_total=actual_count(Favorite, 'user'),
+        )
+
+    @admin.display(
+        description='Количество подписок', ordering='subscriptions_total')
     def subscriptions_count(self, obj):
         """Возвращает количество подписок пользователя."""
-        return Subscription.objects.filter(user=obj).count()
-
-    @admin.display(description='Количество рецептов')
-    def recipes_count(self, obj):
-        """Возвращает количество рецептов пользователя."""
-        return Recipe.objects.filter(author=obj).count()
+        return obj.subscriptions_total
 
-    @admin.display(description='Число избранных рецептов')
+    @admin.display(
+        description='Число избранных рецептов', ordering='favorites_total')
     def favorited_recipes_count(self, obj):
         """Возвращает количество избранных рецептов пользователя."""
-        return Favorite.objects.filter(user=obj).count()
+        return obj.favorites_total
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdmin):
     """Админка для подписок."""
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='membership_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия отметок'),
+        ),
+    ]
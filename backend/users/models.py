@@ -7,7 +7,27 @@ from users.validators import validate_username_not_me
 from foodgram import constants
 
 
-class CustomUser(AbstractUser):
+class CounterFieldsMixin:
+    """Миксин, не перезаписывающий счетчики при сохранении объекта.
+
+    Счетчики меняются только выражениями F() в обработчиках сигналов,
+    а их значения в загруженном объекте могли устареть.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        """Сохраняет все поля, кроме счетчиков."""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class CustomUser(CounterFieldsMixin, AbstractUser):
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ("username", "first_name", "last_name")
@@ -42,6 +62,20 @@ class CustomUser(AbstractUser):
         blank=True,
         verbose_name="Аватар",
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество рецептов"
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество подписчиков"
+    )
+    # Увеличивается при каждом изменении избранного, корзины и подписок
+    # пользователя; по ней процессы проверяют кэш этих отметок.
+    membership_version = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Версия отметок"
+    )
+
+    counter_fields = (
+        "recipes_count", "subscribers_count", "membership_version")
 
     class Meta:
         ordering = ["username"]